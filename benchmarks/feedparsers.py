@@ -0,0 +1,234 @@
+"""
+Offline throughput, latency & peak memory benchmark for every feed parser
+
+Each parser is run against a payload from benchmarks/fixtures, so no network access is needed.
+The committed fixtures are synthetic payloads in each feed's layout (the Overwatch page uses
+the parseOWpatches synthetic layout); refresh them from the live feeds with --record to
+benchmark real payloads. Run from the repository root:
+
+    $ python -m benchmarks.feedparsers
+    $ python -m benchmarks.feedparsers overwatch steam --repeats 500
+    $ python -m benchmarks.feedparsers --compare benchmarks/results/<previous run>.json
+
+Results are written as JSON to benchmarks/results so runs can be compared over time. Timings
+include decoding the raw payload (e.g. json.loads), as the bots' fetchers do with the response
+body
+
+Each parser's memory is measured in a fresh process, so it isn't affected by the others. Peak
+memory is reported both as Python allocations (tracemalloc) & resident set size growth, since
+lxml allocates its tree outside of Python's allocator
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import time
+import tracemalloc
+import typing
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+from bot.models import Overwatch
+from bot.models.Overwatch import OWPatch
+from bot.models.Reddit import RedditPost
+from bot.models.SpaceX import Launch
+from bot.models.Steam import SteamNewsPost
+
+FIXTURES = Path(__file__).parent / "fixtures"
+RESULTS = Path(__file__).parent / "results"
+
+
+def parseOWpatches(payload: str) -> typing.List:
+    return OWPatch._parseOWpatchHTML(payload)
+
+
+def parsesteamnews(payload: str) -> typing.List:
+    rawdict = json.loads(payload)
+    return [SteamNewsPost(**item) for item in rawdict["appnews"]["newsitems"]]
+
+
+def parseredditlisting(payload: str) -> typing.List:
+    jsonresponse = json.loads(payload)
+    return [RedditPost.fromJSON(post) for post in jsonresponse["data"]["children"]]
+
+
+def parsespacexlaunches(payload: str) -> typing.List:
+    return Launch._gen_obj_list(json.loads(payload))
+
+
+# Parser name: (fixture filename, live source URL, parse function)
+PARSERS = {
+    "overwatch": (
+        "owpatches.html",
+        "https://playoverwatch.com/en-us/news/patch-notes/pc",
+        parseOWpatches,
+    ),
+    "steam": (
+        "steamnews.json",
+        "https://api.steampowered.com/ISteamNews/GetNewsForApp/v0002/"
+        "?appID=582010&count=10&maxlength=300&format=json",
+        parsesteamnews,
+    ),
+    "reddit": (
+        "redditlisting.json",
+        "https://old.reddit.com/r/Overwatch/new/.json",
+        parseredditlisting,
+    ),
+    "spacex": (
+        "spacexlaunches.json",
+        "https://api.spacexdata.com/v3/launches",
+        parsespacexlaunches,
+    ),
+}
+
+
+def _percentile(samples: typing.List[float], pct: float) -> float:
+    """
+    Return the nearest-rank percentile of samples
+    """
+    ordered = sorted(samples)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _measurememory(
+    parse: typing.Callable, payload: str, results: multiprocessing.Queue
+):
+    startrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    nitems = len(parse(payload))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rssgrowth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - startrss
+
+    results.put((nitems, peak, rssgrowth))
+
+
+def runparser(parse: typing.Callable, payload: str, repeats: int) -> typing.Dict:
+    """
+    Run parse on payload repeats times & summarize its throughput, latency & peak memory
+    """
+    # Untimed first run in a fresh process, for the item count & peak memory
+    results = multiprocessing.Queue()
+    worker = multiprocessing.Process(
+        target=_measurememory, args=(parse, payload, results)
+    )
+    worker.start()
+    nitems, peak, rssgrowth = results.get()
+    worker.join()
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        parse(payload)
+        times.append(time.perf_counter() - start)
+
+    total = sum(times)
+    return {
+        "items": nitems,
+        "payload_bytes": len(payload.encode("utf-8")),
+        "repeats": repeats,
+        "items_per_s": nitems * repeats / total,
+        "mb_per_s": len(payload.encode("utf-8")) * repeats / total / 1e6,
+        "p50_ms": statistics.median(times) * 1e3,
+        "p99_ms": _percentile(times, 99) * 1e3,
+        "py_peak_mb": peak / 1e6,
+        "rss_mb": rssgrowth / 1e3,  # ru_maxrss is in kB
+    }
+
+
+def record(names: typing.Iterable[str]):
+    """
+    Refresh the fixtures for the named parsers from their live sources
+    """
+    FIXTURES.mkdir(exist_ok=True)
+    for name in names:
+        filename, sourceURL, _ = PARSERS[name]
+        r = requests.get(sourceURL, headers={"user-agent": "Wumbot benchmark recorder"})
+        r.raise_for_status()
+        (FIXTURES / filename).write_text(r.text, encoding="utf-8")
+        print(f"Recorded {name}: {len(r.content) / 1e3:.1f} kB -> {filename}")
+
+
+def compare(results: typing.Dict, previous: typing.Dict):
+    """
+    Print the change in p50 latency & throughput from a previous run's results
+    """
+    print(f"\nCompared to {previous['timestamp']}:")
+    print(f"{'Parser':<12}{'p50':>10}{'Items/s':>10}")
+    for name, result in results["parsers"].items():
+        if name not in previous["parsers"]:
+            print(f"{name:<12}{'new':>10}")
+            continue
+
+        old = previous["parsers"][name]
+        p50change = result["p50_ms"] / old["p50_ms"] - 1
+        throughputchange = result["items_per_s"] / old["items_per_s"] - 1
+        print(f"{name:<12}{p50change:>+10.1%}{throughputchange:>+10.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the feed parsers offline")
+    parser.add_argument("parsers", nargs="*", help="Parsers to run, default all")
+    parser.add_argument(
+        "--repeats", type=int, default=200, help="Timed runs per parser"
+    )
+    parser.add_argument("--output", type=Path, help="Results JSON, default timestamped")
+    parser.add_argument("--compare", type=Path, help="Previous results JSON to compare")
+    parser.add_argument(
+        "--record", action="store_true", help="Refresh the fixtures from the live feeds"
+    )
+    args = parser.parse_args()
+    names = args.parsers if args.parsers else list(PARSERS)
+    unknown = [name for name in names if name not in PARSERS]
+    if unknown:
+        parser.error(f"Unknown parser(s): {unknown}, choose from {list(PARSERS)}")
+
+    if args.record:
+        record(names)
+        return
+
+    timestamp = datetime.utcnow()
+    results = {
+        "timestamp": timestamp.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "htmlparser": Overwatch.HTMLPARSER,
+        "parsers": {},
+    }
+
+    print(
+        f"{'Parser':<12}{'Items':>7}{'Items/s':>11}{'MB/s':>8}"
+        f"{'p50 (ms)':>10}{'p99 (ms)':>10}{'Py peak (MB)':>14}{'RSS (MB)':>10}"
+    )
+    for name in names:
+        filename, _, parse = PARSERS[name]
+        payload = (FIXTURES / filename).read_text(encoding="utf-8")
+        result = runparser(parse, payload, args.repeats)
+        results["parsers"][name] = result
+
+        print(
+            f"{name:<12}{result['items']:>7}{result['items_per_s']:>11.0f}"
+            f"{result['mb_per_s']:>8.1f}{result['p50_ms']:>10.2f}"
+            f"{result['p99_ms']:>10.2f}{result['py_peak_mb']:>14.2f}"
+            f"{result['rss_mb']:>10.1f}"
+        )
+
+    outpath = args.output
+    if outpath is None:
+        RESULTS.mkdir(exist_ok=True)
+        outpath = RESULTS / f"feedparsers-{timestamp:%Y%m%dT%H%M%S}.json"
+    outpath.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"\nResults written to {outpath}")
+
+    if args.compare is not None:
+        compare(results, json.loads(args.compare.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
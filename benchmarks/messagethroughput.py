@@ -0,0 +1,281 @@
+"""
+Drive the bot's on_message listeners with a synthetic message stream & measure how they keep up
+
+A WumbotClient is created without connecting to Discord, the message handling cogs are loaded,
+and synthetic messages are handed to every on_message listener (the message scanner & any cog
+listeners) as the gateway would, at --rate messages per second. Replies go to a stubbed
+channel with --sendlatency seconds of simulated API latency, and the cogs' HTTP lookups (e.g.
+subreddit validation) are answered by a local HTTPReplay.ReplayServer with --httplatency
+
+Reported are the achieved messages/sec, a histogram of handler latency (from when a message
+is due to when all of its listeners have finished) & event loop lag. Run from the repository
+root:
+
+    $ python -m benchmarks.messagethroughput --messages 20000 --rate 2000
+
+--rate 0 dispatches messages as fast as possible
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import typing
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+from yarl import URL
+
+from bot.__main__ import WumbotClient
+from bot.utils.HTTPReplay import Cassette, ReplayServer
+from bot.utils.ValidatorCache import ValidatorCache
+from bot.utils.WebClient import WebClient
+
+VALIDSUBREDDITS = ("python", "overwatch", "MonsterHunter", "spacex", "RocketLeague")
+INVALIDSUBREDDITS = ("notarealsubreddit", "wumbologyinc", "asdfghjkl")
+WORDS = (
+    "the patch is out later today lol did anyone see that play of the game "
+    "wumbo wumbology I wumbo you wumbo he she me wumbo"
+).split()
+
+# Latency histogram bucket upper bounds, seconds
+BUCKETS = (1e-4, 1e-3, 1e-2, 1e-1, 1, float("inf"))
+
+
+class FakeChannel:
+    def __init__(self, sendlatency: float = 0):
+        """
+        Stand-in for a Discord text channel, replies are counted & dropped after sendlatency
+        """
+        self.id = 0
+        self.sendlatency = sendlatency
+        self.sent = 0
+
+    async def send(self, content: str = None, **kwargs):
+        if self.sendlatency:
+            await asyncio.sleep(self.sendlatency)
+        self.sent += 1
+
+
+def fakeuser(userid: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=userid, name=f"user{userid}", bot=False, mention=f"<@{userid}>"
+    )
+
+
+def chatter(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 25)))
+
+
+# Message kind: (share of messages, content generator)
+MESSAGEMIX = {
+    "chatter": (0.85, chatter),
+    "subreddit": (
+        0.08,
+        lambda rng: f"{chatter(rng)} /r/{rng.choice(VALIDSUBREDDITS + INVALIDSUBREDDITS)}",
+    ),
+    "vreddit": (
+        0.02,
+        lambda rng: f"https://v.redd.it/{rng.randrange(16 ** 8):08x}/DASHPlaylist.mpd",
+    ),
+    "amazon": (
+        0.05,
+        lambda rng: (
+            f"{chatter(rng)} https://www.amazon.com/Some-Product/dp/"
+            f"B0{rng.randrange(10 ** 8):08d}/ref=sr_1_1?keywords=thing"
+        ),
+    ),
+}
+
+
+def messagestream(
+    nmessages: int, channel: FakeChannel, seed: int = None
+) -> typing.Iterator[typing.Tuple[str, SimpleNamespace]]:
+    """
+    Yield (kind, message) pairs of synthetic messages following MESSAGEMIX
+    """
+    rng = random.Random(seed)
+    kinds = list(MESSAGEMIX)
+    weights = [MESSAGEMIX[kind][0] for kind in kinds]
+    users = [fakeuser(userid) for userid in range(100, 120)]
+    for messageid in range(nmessages):
+        kind = rng.choices(kinds, weights)[0]
+        message = SimpleNamespace(
+            id=messageid,
+            content=MESSAGEMIX[kind][1](rng),
+            author=rng.choice(users),
+            channel=channel,
+            guild=None,
+        )
+        yield kind, message
+
+
+def seedcassette(cassette: Cassette):
+    """
+    Record Reddit's subreddit info responses for the subreddits mentioned in the stream
+    """
+    for subreddit in VALIDSUBREDDITS + INVALIDSUBREDDITS:
+        infoURL = URL("https://www.reddit.com/api/info.json").with_query(
+            {"sr_name": subreddit.lower()}
+        )
+        children = []
+        if subreddit in VALIDSUBREDDITS:
+            children.append({"kind": "t5", "data": {"display_name": subreddit}})
+
+        body = json.dumps({"kind": "Listing", "data": {"children": children}})
+        headers = [("Content-Type", "application/json")]
+        cassette.put("GET", infoURL, 200, headers, body.encode("utf-8"))
+
+
+async def looplag(interval: float, lags: typing.List[float]):
+    """
+    Record how late the event loop wakes up from each interval second sleep
+    """
+    loop = asyncio.get_event_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - start - interval)
+
+
+def _percentile(samples: typing.List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(1, round(pct / 100 * len(ordered))) - 1]
+
+
+def _formatseconds(seconds: float) -> str:
+    if seconds == float("inf"):
+        return "inf"
+    elif seconds < 1e-3:
+        return f"{seconds * 1e6:.0f} us"
+    elif seconds < 1:
+        return f"{seconds * 1e3:.0f} ms"
+    else:
+        return f"{seconds:.0f} s"
+
+
+def printhistogram(latencies: typing.List[float], width: int = 40):
+    counts = Counter()
+    for latency in latencies:
+        counts[next(bound for bound in BUCKETS if latency <= bound)] += 1
+
+    lower = 0
+    for bound in BUCKETS:
+        bar = "#" * round(width * counts[bound] / len(latencies))
+        label = f"{_formatseconds(lower)} - {_formatseconds(bound)}"
+        print(f"  {label:<18}{counts[bound]:>8} {bar}")
+        lower = bound
+
+
+async def drive(client: WumbotClient, args: argparse.Namespace, channel: FakeChannel):
+    listeners = client.extra_events.get("on_message", [])
+    loop = asyncio.get_event_loop()
+
+    latencies = {kind: [] for kind in MESSAGEMIX}
+    lags = []
+    lagmonitor = asyncio.ensure_future(looplag(args.laginterval, lags))
+
+    async def handle(kind: str, message: SimpleNamespace, due: float):
+        await asyncio.gather(*(listener(message) for listener in listeners))
+        latencies[kind].append(loop.time() - due)
+
+    tasks = []
+    start = loop.time()
+    for idx, (kind, message) in enumerate(
+        messagestream(args.messages, channel, args.seed)
+    ):
+        if args.rate:
+            due = start + idx / args.rate
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+        else:
+            due = loop.time()
+            # Let the handlers & lag monitor run between batches
+            if idx % 100 == 0:
+                await asyncio.sleep(0)
+
+        tasks.append(asyncio.ensure_future(handle(kind, message, due)))
+
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+    lagmonitor.cancel()
+
+    return latencies, lags, elapsed
+
+
+async def run(args: argparse.Namespace, workdir: Path):
+    cassette = Cassette(workdir / "cassette")
+    seedcassette(cassette)
+    server = ReplayServer(cassette, latency=args.httplatency, seed=args.seed)
+    await server.start()
+
+    webclient = WebClient(
+        validators=ValidatorCache(workdir / "httpvalidators.JSON"), replay=server
+    )
+    client = WumbotClient(command_prefix="~", webclient=webclient)
+    # Stand in for the logged in user, so the scanner's self-reply check works offline
+    client._connection.user = fakeuser(1)
+    for cog in args.cogs:
+        client.load_extension(cog)
+
+    channel = FakeChannel(args.sendlatency)
+    try:
+        latencies, lags, elapsed = await drive(client, args, channel)
+    finally:
+        await webclient.close()
+        await server.close()
+
+    alllatencies = [latency for kind in latencies.values() for latency in kind]
+    print(
+        f"{args.messages} messages in {elapsed:.2f} s: "
+        f"{args.messages / elapsed:.0f} messages/s (target {args.rate or 'max'}), "
+        f"{channel.sent} replies, {server.stats['requests']} HTTP requests"
+    )
+
+    print(f"\n{'Kind':<12}{'Count':>7}{'p50 (ms)':>10}{'p99 (ms)':>10}{'Max (ms)':>10}")
+    for kind, samples in (*latencies.items(), ("all", alllatencies)):
+        if samples:
+            print(
+                f"{kind:<12}{len(samples):>7}{statistics.median(samples) * 1e3:>10.2f}"
+                f"{_percentile(samples, 99) * 1e3:>10.2f}{max(samples) * 1e3:>10.2f}"
+            )
+
+    print("\nHandler latency:")
+    printhistogram(alllatencies)
+
+    if lags:
+        print(
+            f"\nEvent loop lag ({len(lags)} samples): "
+            f"p50 {statistics.median(lags) * 1e3:.2f} ms, "
+            f"p99 {_percentile(lags, 99) * 1e3:.2f} ms, max {max(lags) * 1e3:.2f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark on_message throughput")
+    parser.add_argument("--messages", type=int, default=10000, help="Messages to send")
+    parser.add_argument(
+        "--rate", type=float, default=1000, help="Messages/s, 0 for max"
+    )
+    parser.add_argument("--sendlatency", type=float, default=0.05, help="Reply latency")
+    parser.add_argument("--httplatency", type=float, default=0.1, help="HTTP latency")
+    parser.add_argument("--laginterval", type=float, default=0.01, help="Lag sampling")
+    parser.add_argument("--seed", type=int, default=0, help="Message stream seed")
+    parser.add_argument(
+        "--cogs",
+        nargs="+",
+        default=["bot.cogs.reddit", "bot.cogs.amazon"],
+        help="Cogs to load",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The client binds to the current event loop when it's created
+        asyncio.get_event_loop().run_until_complete(run(args, Path(workdir)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Compare parse time, time to first patch & peak memory of the Overwatch patch notes parser
+backends
+
+Run from the repository root, against a saved copy of the patch notes page:
+
+    $ curl -o owpatches.html https://playoverwatch.com/en-us/news/patch-notes/pc
+    $ python -m benchmarks.parseOWpatches owpatches.html
+
+If no page is provided, a synthetic page with --patches patches is generated instead
+
+Each backend is run in a fresh process so its peak memory isn't affected by the others. Peak
+memory is reported both as Python allocations (tracemalloc) & resident set size growth, since
+lxml allocates its tree outside of Python's allocator
+"""
+
+import argparse
+import multiprocessing
+import resource
+import statistics
+import time
+import tracemalloc
+import typing
+from pathlib import Path
+
+from bot.models import Overwatch
+from bot.models.Overwatch import OWPatch
+
+BACKENDS = {
+    "html.parser": lambda inHTML: OWPatch._parseOWpatchHTML(inHTML, "html.parser"),
+    "lxml": lambda inHTML: OWPatch._parseOWpatchHTML(inHTML, "lxml"),
+}
+
+
+def syntheticpage(
+    npatches: int, paragraphs: int = 50, headingbeside: bool = False
+) -> str:
+    """
+    Generate a patch notes page with the same layout as Blizzard's
+
+    Each sidebar item's heading & date are inside its anchor, or alongside it if headingbeside
+    is True. Each patch body has headings of its own, which must not be mistaken for the
+    sidebar's
+    """
+    sidebar = []
+    body = []
+    for idx in range(npatches):
+        patchref = f"patch-{50000 + idx}"
+        sidebaritem = f"<h3>Overwatch 1.{idx}.0.1</h3><p>01/{idx % 28 + 1:02d}/2019</p>"
+        if headingbeside:
+            sidebaritem = f'<a href="#{patchref}">View</a>{sidebaritem}'
+        else:
+            sidebaritem = f'<a href="#{patchref}">{sidebaritem}</a>'
+        sidebar.append(f'<li class="PatchNotesSideNav-listItem">{sidebaritem}</li>')
+        notes = "<h3>Hero Updates</h3>" + "".join(
+            f"<p>Hero <strong>update</strong> {n}, <em>adjusted</em> values</p>"
+            for n in range(paragraphs)
+        )
+        body.append(
+            f'<div class="patch-notes-patch" id="{patchref}">'
+            f'<div class="HeadingBanner" style="background-image: url(https://x/{idx}.jpg);">'
+            f'<h2 class="HeadingBanner-header">January {idx % 28 + 1}, 2019</h2></div>'
+            f'<div class="patch-notes-body">{notes}</div></div>'
+        )
+
+    return (
+        "<html><head><script>var x = 1;</script></head><body>"
+        f"<nav><ul>{''.join(sidebar)}</ul></nav>{''.join(body)}</body></html>"
+    )
+
+
+def checkbackends(inHTML: str, names: typing.Iterable[str]):
+    """
+    Check that every backend in names parses the same patches from inHTML, raising
+    ValueError if any differ
+    """
+    parsed = {
+        name: [patch.verpatch for patch in BACKENDS[name](inHTML)] for name in names
+    }
+
+    expected = next(iter(parsed.values()))
+    mismatched = [name for name, verpatches in parsed.items() if verpatches != expected]
+    if mismatched:
+        raise ValueError(
+            f"Backends disagree on the parsed patches: {mismatched} differ from "
+            f"{next(iter(parsed))}, e.g. {parsed[mismatched[0]][:1]} vs {expected[:1]}"
+        )
+
+
+def _runbackend(name: str, inHTML: str, repeats: int, results: multiprocessing.Queue):
+    parse = BACKENDS[name]
+
+    startrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    npatches = sum(1 for _ in parse(inHTML))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rssgrowth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - startrss
+
+    firsttimes = []
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        patches = iter(parse(inHTML))
+        next(patches)
+        firsttimes.append(time.perf_counter() - start)
+        for _ in patches:
+            pass
+        times.append(time.perf_counter() - start)
+
+    results.put(
+        (
+            npatches,
+            statistics.median(firsttimes),
+            statistics.median(times),
+            peak,
+            rssgrowth,
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OW patch notes parsing")
+    parser.add_argument("page", nargs="?", type=Path, help="Saved patch notes HTML")
+    parser.add_argument("--patches", type=int, default=300, help="Synthetic page size")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per backend")
+    parser.add_argument(
+        "--headingbeside",
+        action="store_true",
+        help="Synthetic sidebar headings alongside their anchors",
+    )
+    args = parser.parse_args()
+
+    if args.page is not None:
+        inHTML = args.page.read_text(encoding="utf-8")
+        source = str(args.page)
+    else:
+        inHTML = syntheticpage(args.patches, headingbeside=args.headingbeside)
+        source = f"synthetic page, {args.patches} patches"
+
+    print(f"{source}: {len(inHTML) / 1e6:.2f} MB")
+
+    installed = [
+        name
+        for name in BACKENDS
+        if not (name.startswith("lxml") and Overwatch.lxml is None)
+    ]
+    checkbackends(inHTML, installed)
+
+    print(
+        f"{'Backend':<26}{'Patches':>8}{'First (ms)':>12}{'Total (ms)':>12}"
+        f"{'Py peak (MB)':>14}{'RSS (MB)':>10}"
+    )
+
+    context = multiprocessing.get_context("spawn")
+    for name in BACKENDS:
+        if name.startswith("lxml") and Overwatch.lxml is None:
+            print(f"{name:<26}{'not installed':>8}")
+            continue
+
+        results = context.Queue()
+        worker = context.Process(
+            target=_runbackend, args=(name, inHTML, args.repeats, results)
+        )
+        worker.start()
+        npatches, first, total, peak, rssgrowth = results.get()
+        worker.join()
+
+        print(
+            f"{name:<26}{npatches:>8}{first * 1e3:>12.1f}{total * 1e3:>12.1f}"
+            f"{peak / 1e6:>14.1f}{rssgrowth / 1e3:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Offline load test of concurrent NewsParser.patchcheck runs against replayed upstreams
+
+--fanout copies of an Overwatch patch notes, Steam news & Reddit listing parser are checked
+concurrently with checkall, for --rounds rounds, through a local HTTPReplay.ReplayServer with
+the configured latency & injected error rate. All parsers share one WebClient, so after a
+parser's first successful check its requests are conditional & answered with 304s, as in
+production. A parser whose check failed refetches the full page in the next round
+
+Run from the repository root:
+
+    $ python -m benchmarks.patchcheckload --fanout 20 --latency 0.2 --errorrate 0.05
+
+By default the upstreams are replayed from the synthetic payloads in benchmarks/fixtures. To
+replay live traffic instead, record a cassette once, then replay it:
+
+    $ python -m benchmarks.patchcheckload --cassette ./log/cassette --record
+    $ python -m benchmarks.patchcheckload --cassette ./log/cassette
+"""
+
+import argparse
+import asyncio
+import hashlib
+import statistics
+import tempfile
+import time
+import typing
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+from yarl import URL
+
+from benchmarks.feedparsers import FIXTURES, PARSERS
+from bot.models.NewsParser import NewsParser, checkall
+from bot.models.NewsStorage import JournalStorage
+from bot.models.Overwatch import OWPatch
+from bot.models.PostQueue import PostQueue
+from bot.models.Reddit import RedditJSON
+from bot.models.Steam import SteamNewsPost
+from bot.utils.HTTPReplay import Cassette, ReplayServer
+from bot.utils.ValidatorCache import ValidatorCache
+from bot.utils.WebClient import WebClient
+
+CONTENTTYPES = {".html": "text/html; charset=utf-8", ".json": "application/json"}
+
+
+class _LoadParser(NewsParser):
+    def __init__(self, bot, logdir: Path, name: str, comparator: str):
+        super().__init__(bot)
+        self.logJSONpath = logdir / f"{name}.JSON"
+
+        self._parsername = name
+        self._saveconverter = str
+        self._comparator = comparator
+
+    async def postembed(self, postobj: typing.Any = None, channelID: int = None):
+        self.bot.posted[self._parsername] += 1
+
+    async def postdigest(self, posts: typing.List = None, channelID: int = None):
+        self.bot.posted[self._parsername] += len(posts)
+
+
+class OWLoadParser(_LoadParser):
+    async def patchcheck(self):
+        self.loadposted()
+        posts = await OWPatch.asyncfromURL(
+            PARSERS["overwatch"][1],
+            webclient=self.webclient,
+            conditional=True,
+            validators=self.validators,
+            isknown=self.isposted,
+            known=frozenset(self.postednews.recent(10)),
+        )
+        await super().patchcheck(posts)
+
+
+class SteamLoadParser(_LoadParser):
+    async def patchcheck(self):
+        posts = await SteamNewsPost.asyncgetnewsforapp(
+            webclient=self.webclient, conditional=True, validators=self.validators
+        )
+        await super().patchcheck(posts)
+
+
+class RedditLoadParser(_LoadParser):
+    async def patchcheck(self):
+        posts = await RedditJSON.asyncfromJSON(
+            PARSERS["reddit"][1],
+            webclient=self.webclient,
+            conditional=True,
+            validators=self.validators,
+        )
+        await super().patchcheck(posts)
+
+
+# Parser class, fixture key, comparator
+FEEDS = (
+    (OWLoadParser, "overwatch", "verpatch"),
+    (SteamLoadParser, "steam", "gid"),
+    (RedditLoadParser, "reddit", "id"),
+)
+
+
+def seedcassette(cassette: Cassette):
+    """
+    Record the benchmark fixtures as the upstream responses, with an ETag so conditional
+    requests can be answered
+    """
+    for _, name, _ in FEEDS:
+        filename, sourceURL, _ = PARSERS[name]
+        body = (FIXTURES / filename).read_bytes()
+        headers = [
+            ("Content-Type", CONTENTTYPES[Path(filename).suffix]),
+            ("ETag", f'"{hashlib.sha1(body).hexdigest()[:16]}"'),
+        ]
+        cassette.put("GET", URL(sourceURL), 200, headers, body)
+
+
+async def loadtest(args: argparse.Namespace, workdir: Path):
+    if args.cassette is not None:
+        cassette = Cassette(args.cassette)
+    else:
+        cassette = Cassette(workdir / "cassette")
+        seedcassette(cassette)
+
+    server = ReplayServer(
+        cassette,
+        record=args.record,
+        latency=args.latency,
+        jitter=args.jitter,
+        errorrate=args.errorrate,
+        seed=args.seed,
+    )
+    await server.start()
+
+    # Every request goes to the one local server, so don't let the per-host limit throttle
+    # the fan-out of what would be requests to different upstreams
+    webclient = WebClient(
+        limit_per_host=0,
+        validators=ValidatorCache(workdir / "httpvalidators.JSON"),
+        replay=server,
+    )
+    bot = SimpleNamespace(
+        webclient=webclient,
+        postqueue=PostQueue(),
+        newsstorage=JournalStorage.fromparser,
+        posted=Counter(),
+    )
+
+    parsers = []
+    for idx in range(args.fanout):
+        for parsercls, name, comparator in FEEDS:
+            parser = parsercls(bot, workdir, f"{name}-{idx}", comparator)
+            parser.checktimeout = args.timeout
+            parsers.append(parser)
+
+    print(
+        f"{len(parsers)} parsers, {args.latency * 1e3:.0f} ms (+{args.jitter * 1e3:.0f} ms) "
+        f"latency, {args.errorrate:.0%} injected errors"
+    )
+    print(f"{'Round':<7}{'Wall (s)':>10}{'Failed':>8}{'Timed out':>11}{'Posted':>8}")
+    walltimes = []
+    try:
+        for roundno in range(1, args.rounds + 1):
+            bot.posted.clear()
+            start = time.perf_counter()
+            errors = await checkall(parsers)
+            walltimes.append(time.perf_counter() - start)
+
+            failed = sum(error is not None for error in errors)
+            timedout = sum(isinstance(error, asyncio.TimeoutError) for error in errors)
+            print(
+                f"{roundno:<7}{walltimes[-1]:>10.2f}{failed:>8}{timedout:>11}"
+                f"{sum(bot.posted.values()):>8}"
+            )
+    finally:
+        await webclient.close()
+        await server.close()
+
+    print(f"\nMedian round: {statistics.median(walltimes):.2f} s")
+    print(
+        "Replay server: "
+        + ", ".join(f"{stat} {count}" for stat, count in sorted(server.stats.items()))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test feed checks offline")
+    parser.add_argument("--fanout", type=int, default=10, help="Parsers per feed")
+    parser.add_argument("--rounds", type=int, default=3, help="Check rounds to run")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Seconds per request"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.05, help="Extra random latency"
+    )
+    parser.add_argument(
+        "--errorrate", type=float, default=0, help="Injected error rate"
+    )
+    parser.add_argument("--timeout", type=float, default=300, help="Check timeout (s)")
+    parser.add_argument("--seed", type=int, help="Seed for latency jitter & errors")
+    parser.add_argument("--cassette", type=Path, help="Recorded cassette directory")
+    parser.add_argument(
+        "--record", action="store_true", help="Record the live upstreams to --cassette"
+    )
+    args = parser.parse_args()
+
+    if args.record and args.cassette is None:
+        parser.error("--record requires --cassette")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        asyncio.get_event_loop().run_until_complete(loadtest(args, Path(workdir)))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,9 @@ import sentry_sdk
 with open("./credentials.JSON", "r") as f:
     _tmp = json.load(f)
     SENTRY_ENDPOINT = _tmp.get("SENTRY_ENDPOINT", None)
+    NEWS_STORAGE = _tmp.get("NEWS_STORAGE", "journal")
+    PARSE_EXECUTOR = _tmp.get("PARSE_EXECUTOR", "process")
+    METRICS_PORT = _tmp.get("METRICS_PORT", 9108)
 
 if SENTRY_ENDPOINT:
     sentry_sdk.init(SENTRY_ENDPOINT)
@@ -4,16 +4,56 @@ from datetime import datetime
 
 from discord.ext import commands
 
+from bot import NEWS_STORAGE, PARSE_EXECUTOR
+from bot.models import NewsStorage, PostQueue, Reddit
+from bot.models.FeedScheduler import FeedScheduler
+from bot.models.LoopMonitor import LoopMonitor
+from bot.models.MessageScanner import MessageScanner
+from bot.utils import Executors, WebClient
+
 
 class WumbotClient(commands.Bot):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, webclient: WebClient.WebClient = None, **kwargs):
         super(WumbotClient, self).__init__(*args, **kwargs)
 
+        # Shared, pooled HTTP client for all outbound (non-Discord) requests
+        self.webclient = webclient if webclient is not None else WebClient.WebClient()
+
+        # Orders & rate limits the posts sent by NewsParsers, per channel
+        self.postqueue = PostQueue.PostQueue()
+
+        # Posted news storage factory for NewsParsers, per-parser journals in ./log by default,
+        # optionally a shared SQLite DB
+        if NEWS_STORAGE.lower() == "sqlite":
+            self.newsstorage = NewsStorage.SQLiteStorage.fromparser
+            logging.info("Using SQLite posted news storage")
+        else:
+            self.newsstorage = NewsStorage.JournalStorage.fromparser
+
+        # Long-lived PRAW session, authenticated once & shared by the Reddit based parsers
+        self.redditmanager = Reddit.RedditClientManager()
+
+        # Polls every NewsParser registered by the loaded cogs
+        self.feedscheduler = FeedScheduler(self)
+
+        # Shared link & text detection for the loaded cogs' on_message handlers
+        self.messagescanner = MessageScanner(self)
+
+        # Samples event loop lag & reports callbacks that block the loop
+        self.loopmonitor = LoopMonitor(self)
+        self.loopmonitor.start()
+
     async def on_ready(self):
         self.launch_time = datetime.utcnow()
         logging.info(f"Logged in as {self.user}")
         print(f"Logged in as {self.user}")  # Keep print statement for dev debugging
 
+    async def close(self):
+        self.loopmonitor.stop()
+        await super().close()
+        await self.webclient.close()
+        Executors.shutdown()
+
 
 def loadCredentials(credentialJSON) -> str:
     """
@@ -25,21 +65,31 @@ def loadCredentials(credentialJSON) -> str:
     return credentials["DiscordToken"]
 
 
-credentialpath = "./credentials.JSON"
-credentials = loadCredentials(credentialpath)
-if credentials:
-    client = WumbotClient(
-        command_prefix=commands.when_mentioned_or("~"), case_insensitive=True
-    )
-
-    # Load cogs
-    client.load_extension("bot.cogs.bot")
-    client.load_extension("bot.cogs.reddit")
-    client.load_extension("bot.cogs.overwatch")
-    client.load_extension("bot.cogs.wumbopresence")
-
-    # Finally, try to log in
-    client.run(credentials)
-else:
-    logging.info(f"Credential file empty: {credentialpath}")
-    raise EnvironmentError
+def main():
+    credentialpath = "./credentials.JSON"
+    credentials = loadCredentials(credentialpath)
+    if credentials:
+        # CPU-heavy parsing runs in worker processes by default, optionally use threads instead
+        Executors.setcpupool(PARSE_EXECUTOR.lower())
+
+        client = WumbotClient(
+            command_prefix=commands.when_mentioned_or("~"), case_insensitive=True
+        )
+
+        # Load cogs
+        client.load_extension("bot.cogs.bot")
+        client.load_extension("bot.cogs.reddit")
+        client.load_extension("bot.cogs.amazon")
+        client.load_extension("bot.cogs.overwatch")
+        client.load_extension("bot.cogs.wumbopresence")
+        client.load_extension("bot.cogs.metrics")
+
+        # Finally, try to log in
+        client.run(credentials)
+    else:
+        logging.info(f"Credential file empty: {credentialpath}")
+        raise EnvironmentError
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,147 @@
+import asyncio
+import logging
 import re
+import typing
 
+import aiohttp
+import discord
+from discord.ext import commands
+from yarl import URL
 
-class Amazon:
+from bot.utils.Cache import TTLCache
+
+# Amazon URL path segments that precede a product's ASIN
+PRODUCTMARKERS = ("dp", "product", "d", "asin")
+ASINREGEX = re.compile(r"[A-Z0-9]{10}", flags=re.IGNORECASE)
+
+
+class Amazon(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    async def on_message(self, message):
-        # Avoid self-replies
-        if message.author.id == self.bot.user.id:
-            return
+        # Resolved a.co short links, so repeated shares of a product skip the redirect lookup
+        self.shortlinkcache = TTLCache(maxsize=1024, ttl=24 * 3600)
 
-        # Check for "regular" Amazon link, capture full link & ASIN
-        testAmazonASIN = re.search(
-            r"https?.*\/\/.+\.amazon\..+\/([A-Z0-9]{10})\/\S*",
-            message.content,
+        # Check for "regular" Amazon link (e.g. https://www.amazon.com/*), capture full link
+        # The ASIN is extracted when the link is canonicalized
+        self.bot.messagescanner.register(
+            "amazonASIN",
+            r"https?:\/\/(?:[\w-]+\.)*amazon\.[a-z.]+\/\S+",
+            self.amazonlinks,
             flags=re.IGNORECASE,
+            prefilters=("amazon.",),
         )
         # Check for shortened Amazon link (https://a.co/*), capture full link
-        testAmazonShort = re.search(
-            r"https?:\/\/a\.co\S*", message.content, flags=re.IGNORECASE
+        self.bot.messagescanner.register(
+            "amazonShort",
+            r"https?:\/\/a\.co\S*",
+            self.amazonlinks,
+            flags=re.IGNORECASE,
+            prefilters=("a.co",),
         )
 
-        if testAmazonASIN or testAmazonShort:
-            raise NotImplementedError
+    def cog_unload(self):
+        self.bot.messagescanner.unregister("amazonASIN")
+        self.bot.messagescanner.unregister("amazonShort")
+
+    async def amazonlinks(
+        self, message: discord.Message, matches: typing.List[typing.Match]
+    ):
+        """
+        This function is a coroutine
+
+        Message scanner callback for Amazon product links, reply with their canonical
+        /dp/<ASIN> form. Links that are already canonical or can't be resolved are ignored
+        """
+        links = []
+        for match in matches:
+            if match.group(0) not in links:
+                links.append(match.group(0))
+
+        canonical = await asyncio.gather(*map(self.canonicalize, links))
+
+        newlinks = []
+        for link, canonicallink in zip(links, canonical):
+            if canonicallink is not None and canonicallink != URL(link):
+                newlinks.append(str(canonicallink))
+
+        if newlinks:
+            logging.info(f"Amazon link(s) converted to: {newlinks}")
+            newlinkstr = "\n".join(newlinks)
+            await message.channel.send(
+                f"Here {message.author.mention}, let me clean up that Amazon link for you:\n"
+                f"{newlinkstr}"
+            )
+
+    async def canonicalize(self, link: typing.Union[str, URL]) -> typing.Optional[URL]:
+        """
+        This function is a coroutine
+
+        Return the canonical https://<Amazon host>/dp/<ASIN> URL for an Amazon product link,
+        or None if no ASIN can be found
+
+        Shortened a.co links are resolved by following their redirects with a HEAD request,
+        results are cached
+        """
+        link = URL(link)
+        if link.host is not None and link.host.lower() == "a.co":
+            return await self._resolveshortlink(link)
+
+        return self.canonicalURL(link)
+
+    async def _resolveshortlink(self, link: URL) -> typing.Optional[URL]:
+        """
+        This function is a coroutine
+
+        Resolve an a.co link to its canonical product URL, using the cache where possible
+
+        If the redirect can't be followed, None is returned and the result is not cached
+        """
+        cached = self.shortlinkcache.get(str(link))
+        if cached is not None:
+            return cached
+
+        try:
+            async with self.bot.webclient.head(link, allow_redirects=True) as resp:
+                resolved = resp.url
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.info(f"Could not resolve Amazon short link '{link}': {e!r}")
+            return None
+
+        canonicallink = self.canonicalURL(resolved)
+        if canonicallink is None:
+            logging.info(f"No ASIN found for Amazon short link '{link}': '{resolved}'")
+            return None
+
+        self.shortlinkcache.set(str(link), canonicallink)
+        return canonicallink
+
+    @staticmethod
+    def canonicalURL(link: typing.Union[str, URL]) -> typing.Optional[URL]:
+        """
+        Build the canonical https://<Amazon host>/dp/<ASIN> URL for an Amazon product URL, or
+        return None if link isn't an Amazon URL or contains no ASIN
+
+        e.g. https://www.amazon.com/Some-Product-Name/dp/B01N5IB20Q/ref=sr_1_1?keywords=product
+             to
+             https://www.amazon.com/dp/B01N5IB20Q
+        """
+        link = URL(link)
+        if link.host is None or ".amazon." not in f".{link.host.lower()}":
+            return None
+
+        # The ASIN follows a product marker in the path, e.g. /dp/<ASIN> or /gp/product/<ASIN>
+        segments = [segment for segment in link.path.split("/") if segment]
+        for marker, segment in zip(segments, segments[1:]):
+            if marker.lower() in PRODUCTMARKERS and ASINREGEX.fullmatch(segment):
+                ASIN = segment.upper()
+                break
+        else:
+            return None
+
+        return URL.build(scheme="https", host=link.host.lower(), path=f"/dp/{ASIN}")
 
 
 def setup(bot):
     bot.add_cog(Amazon(bot))
+    logging.info("Amazon Cog loaded")
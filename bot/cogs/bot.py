@@ -7,7 +7,7 @@ import discord
 import git
 from discord.ext import commands
 
-from bot.utils import Helpers
+from bot.utils import Executors, Helpers
 
 
 class MainCommands(commands.Cog):
@@ -21,13 +21,17 @@ class MainCommands(commands.Cog):
         """
         Reply with current Wumbot version number from the git master branch tag
         """
-        currRepo = git.Repo(".")
-        repoGit = currRepo.git
         try:
-            await ctx.message.channel.send(f"Current Version: {repoGit.describe()}")
+            # GitPython shells out to git, keep it off the event loop
+            version = await Executors.runblocking(self._describeversion)
+            await ctx.message.channel.send(f"Current Version: {version}")
         except git.GitCommandError:
             await ctx.send("No tags found on current branch")
 
+    @staticmethod
+    def _describeversion() -> str:
+        return git.Repo(".").git.describe()
+
     @commands.command()
     async def uptime(self, ctx: commands.Context):
         """
@@ -64,6 +68,21 @@ class MainCommands(commands.Cog):
                 f"{ctx.message.author.mention}, you are not authorized to perform this operation"
             )
 
+    @commands.command(hidden=True)
+    async def perf(self, ctx: commands.Context):
+        """
+        Reply with recent event loop lag & stalls
+
+        Only valid if bot owner invokes the command
+        """
+        if Helpers.isOwner(ctx.message.author):
+            await ctx.send(f"```\n{self.bot.loopmonitor.summary()}\n```")
+        else:
+            logging.info(f"Unauthorized perf attempt by {ctx.message.author}")
+            await ctx.send(
+                f"{ctx.message.author.mention}, you are not authorized to perform this operation"
+            )
+
     @commands.command(name="reactmessage", aliases=("react",))
     async def reactmessage(
         self, ctx: commands.Context, *args, selfdestructdelay: int = 10
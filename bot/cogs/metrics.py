@@ -0,0 +1,97 @@
+import functools
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+
+from aiohttp import web
+from discord.ext import commands, tasks
+
+from bot import METRICS_PORT
+from bot.utils import Helpers, Metrics
+
+
+class MetricsExporter(commands.Cog):
+    def __init__(self, bot):
+        """
+        Export the bot-wide metrics registry
+
+        Metrics are served in the Prometheus text format at http://127.0.0.1:<port>/metrics,
+        where port is METRICS_PORT from credentials.JSON (a falsy port disables the endpoint),
+        and a JSON snapshot is written to ./log/metrics.JSON every 5 minutes
+        """
+        self.bot = bot
+        self.host = "127.0.0.1"
+        self.port = METRICS_PORT
+        self.snapshotpath = Path("./log/metrics.JSON")
+
+        self._runner = None
+
+        if self.port:
+            self.bot.loop.create_task(self.startendpoint())
+        self.snapshottimer.start()
+
+    def cog_unload(self):
+        self.snapshottimer.cancel()
+        self.bot.loop.create_task(self.stopendpoint())
+
+    async def startendpoint(self):
+        """
+        This function is a coroutine
+
+        Start serving the Prometheus endpoint on localhost
+        """
+        app = web.Application()
+        app.router.add_get("/metrics", self.prometheus)
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+        except OSError as e:
+            logging.error(f"Could not serve metrics on {self.host}:{self.port}: {e!r}")
+            await self.stopendpoint()
+            return
+
+        logging.info(f"Serving metrics at http://{self.host}:{self.port}/metrics")
+
+    async def stopendpoint(self):
+        """
+        This function is a coroutine
+
+        Stop serving the Prometheus endpoint
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def prometheus(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=Metrics.getregistry().prometheus().encode("utf-8"),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    @tasks.loop(minutes=5)
+    async def snapshottimer(self):
+        self.writesnapshot()
+
+    def writesnapshot(self):
+        """
+        Write the current metrics, with a UTC timestamp, to the snapshot JSON
+        """
+        snapshot = {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            **Metrics.getregistry().snapshot(),
+        }
+
+        try:
+            Helpers.atomicwrite(
+                self.snapshotpath, functools.partial(json.dump, snapshot, indent=2)
+            )
+        except OSError as e:
+            logging.info(f"Could not write metrics snapshot: {e!r}")
+
+
+def setup(bot):
+    bot.add_cog(MetricsExporter(bot))
+    logging.info("Metrics Cog loaded")
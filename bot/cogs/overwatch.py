@@ -1,15 +1,16 @@
 import logging
 import typing
+from datetime import datetime, timedelta
 from pathlib import Path
 
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from yarl import URL
 
 from bot.models.ManualCheck import ManualCheck
 from bot.models.NewsParser import NewsParser
 from bot.models.Overwatch import OWPatch
-from bot.models.Reddit import RedditJSON, RedditPost, RedditPRAW
+from bot.models.Reddit import RedditJSON, RedditPost
 from bot.utils.Constants import Channels
 
 
@@ -20,8 +21,9 @@ class PatchRundownParser(NewsParser):
         self.postchannelID = Channels.ow
         self.logJSONpath = Path("./log/postedRundowns.JSON")
 
+        self.maxpostedage = timedelta(days=180)
+
         self._parsername = "OW Rundown(s)"
-        self._loadconverter = URL
         self._saveconverter = str
         self._comparator = "contentURL"
 
@@ -32,14 +34,15 @@ class PatchRundownParser(NewsParser):
         """
         jsonURL = jsonURL if jsonURL is not None else self.postjsonURL
 
-        prawinstance = RedditPRAW()
-        if prawinstance.isauthenticated:
-            postobjs = [
-                RedditPost.fromPRAW(submission)
-                for submission in prawinstance.getnewusersubmissions("itsjieyang")
-            ]
-        else:
-            postobjs = await RedditJSON.asyncfromJSON(jsonURL)
+        # Use the shared PRAW instance, falling back to Reddit's JSON if authentication fails
+        postobjs = await self.bot.redditmanager.asyncgetnewusersubmissions("itsjieyang")
+        if postobjs is None:
+            postobjs = await RedditJSON.asyncfromJSON(
+                jsonURL,
+                webclient=self.webclient,
+                conditional=self.conditional,
+                validators=self.validators,
+            )
 
         logging.info(f"Found {len(postobjs)} submission(s) by /u/itsjieyang")
 
@@ -99,6 +102,9 @@ class PatchRundownParser(NewsParser):
             )
             await postchannel.send(msg)
 
+    def digestentry(self, postobj: RedditPost) -> str:
+        return f"[{postobj.title}]({postobj.permalink})"
+
     async def patchcheck(self):
         posts = await self.getpatchrundowns()
         await super().patchcheck(posts)
@@ -125,8 +131,17 @@ class PatchNotesParser(NewsParser):
         self.postchannelID = Channels.ow
         self.logJSONpath = Path("./log/postedOWpatches.JSON")
 
+        self.maxpostedage = timedelta(days=180)
+
+        # Most recently seen posted patches sent to the parse worker, so it can stop early
+        # without pickling the whole posted index on every poll
+        self.knownwindow = 10
+
+        # Blizzard typically releases patches early in the week (US time), poll more often then
+        self.patchdays = (1, 2)  # datetime.weekday(), UTC
+        self.patchdayinterval = 900
+
         self._parsername = "OW Patch(es)"
-        self._loadconverter = str
         self._saveconverter = str
         self._comparator = "verpatch"
 
@@ -162,8 +177,31 @@ class PatchNotesParser(NewsParser):
             "A new Overwatch Patch has been released!", embed=postembed
         )
 
+    def digestentry(self, postobj: OWPatch) -> str:
+        return f"[Patch {postobj.verpatch}, {postobj.patchdate:%Y-%m-%d}]({postobj.patchURL})"
+
+    def nextpoll(self) -> float:
+        """
+        Poll every patchdayinterval seconds on patch days, otherwise every pollinterval
+        """
+        if datetime.utcnow().weekday() in self.patchdays:
+            return self.patchdayinterval
+        else:
+            return self.pollinterval
+
     async def patchcheck(self):
-        posts = await OWPatch.asyncfromURL(self.patchesURL)
+        # The page is parsed in the bot-wide CPU pool. Patches are listed newest first, the
+        # worker stops extracting them once it reaches one of our most recently seen posted
+        # patches & we stop building them from its records at the first one in the posted index
+        self.loadposted()
+        posts = await OWPatch.asyncfromURL(
+            self.patchesURL,
+            webclient=self.webclient,
+            conditional=self.conditional,
+            validators=self.validators,
+            isknown=self.isposted,
+            known=frozenset(self.postednews.recent(self.knownwindow)),
+        )
         await super().patchcheck(posts)
 
 
@@ -173,35 +211,28 @@ class OverwatchHelper(commands.Cog):
 
         self.rundown_parser = PatchRundownParser(self.bot)
         self.patch_parser = PatchNotesParser(self.bot)
-        self.overwatch_patch_check_timer.start()
+        self.bot.feedscheduler.register(self.rundown_parser)
+        self.bot.feedscheduler.register(self.patch_parser)
 
     def cog_unload(self):
-        self.overwatch_patch_check_timer.cancel()
-
-    @tasks.loop(hours=1)
-    async def overwatch_patch_check_timer(self):
-        """Task loop for fetching OW game updates"""
-        await self.rundown_parser.patchcheck()
-        await self.patch_parser.patchcheck()
-
-    @overwatch_patch_check_timer.before_loop
-    async def before_patch_check(self):
-        await self.bot.wait_until_ready()
+        self.bot.feedscheduler.unregister(self.rundown_parser)
+        self.bot.feedscheduler.unregister(self.patch_parser)
 
     @commands.command(hidden=True)
     async def checkOWrundown(self, ctx: commands.Context):
+        # Manual checks always fetch the full listing
+        parser = PatchRundownParser(self.bot)
+        parser.conditional = False
         await ManualCheck.check(
-            ctx=ctx,
-            toinvoke=PatchRundownParser(self.bot).patchcheck,
-            commandstr="OW Patch Rundown",
+            ctx=ctx, toinvoke=parser.patchcheck, commandstr="OW Patch Rundown"
         )
 
     @commands.command(hidden=True)
     async def checkOWpatch(self, ctx: commands.Context):
+        parser = PatchNotesParser(self.bot)
+        parser.conditional = False
         await ManualCheck.check(
-            ctx=ctx,
-            toinvoke=PatchNotesParser(self.bot).patchcheck,
-            commandstr="OW Patch",
+            ctx=ctx, toinvoke=parser.patchcheck, commandstr="OW Patch"
         )
 
 
@@ -1,17 +1,49 @@
+import asyncio
 import logging
-import re
 import typing
 
+import aiohttp
 import discord
-import requests
 from discord.ext import commands
 from yarl import URL
 
+from bot.utils.Cache import TTLCache
+
 
 class Reddit(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+        # Subreddit validity is cached by lowercase name, since subreddit names are
+        # case-insensitive. Invalid names expire sooner, in case the subreddit is created
+        self.subredditcache = TTLCache(maxsize=4096, ttl=24 * 3600)
+        self.invalidsubredditttl = 3600
+
+        self._pendinglookups = {}
+
+        # Check to see if /r/_subreddit (e.g. /r/python) has been typed & add a Reddit embed
+        # Ignores regular reddit links (e.g. http://www.reddit.com/r/Python)
+        self.bot.messagescanner.register(
+            "subreddit",
+            r"(?:^|\s)\/?[rR]\/(\w+)",
+            self.subredditmentions,
+            prefilters=("r/",),
+        )
+
+        # Check to see if Reddit's stupid image/video hosting has added 'DashPlaylist.mpd'
+        # to the end of the URL, which links to a direct download (of nothing) rather
+        # than the web content
+        self.bot.messagescanner.register(
+            "vreddit",
+            r"(https?:\/\/v.redd.it\/.*)(DASHPlaylist.*$)",
+            self.vredditlinks,
+            prefilters=("v.redd.it",),
+        )
+
+    def cog_unload(self):
+        self.bot.messagescanner.unregister("subreddit")
+        self.bot.messagescanner.unregister("vreddit")
+
     @staticmethod
     def buildSubredditEmbed(subredditlist: typing.List[str], embedlimit: int = 3):
         """
@@ -54,71 +86,155 @@ class Reddit(commands.Cog):
 
         return embed
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
+    async def subredditmentions(
+        self, message: discord.Message, matches: typing.List[typing.Match]
+    ):
         """
-        Check messages for:
+        This function is a coroutine
 
-           1. Subreddit reference (/r/subreddit) and reply with a link embed. Invalid subreddits
-              are ignored
-           2. Reddit's image/video hosting adding 'DashPlaylist.mpd' to the end of the file, which
-              links to nothing. Reply with a link embed to the media without the suffix
+        Message scanner callback for subreddit references (/r/subreddit), reply with a link
+        embed. Invalid subreddits are ignored
         """
-        # Avoid self-replies
-        if message.author.id == self.bot.user.id:
-            return
-
-        # Check to see if /r/_subreddit (e.g. /r/python) has been typed & add a Reddit embed
-        # Ignores regular reddit links (e.g. http://www.reddit.com/r/Python)
-        testSubreddit = re.findall(r"(?:^|\s)\/?[rR]\/(\w+)", message.content)
-        if testSubreddit:
-            logging.info(f"Subreddit(s) detected: '{testSubreddit}'")
-            logging.info(f"Original message: '{message.content}'")
-            subreddits = [
-                subreddit
-                for subreddit in testSubreddit
-                if self._isvalidsubreddit(subreddit)
-            ]
-            if subreddits:
-                SubredditEmbed = self.buildSubredditEmbed(testSubreddit)
-                await message.channel.send(embed=SubredditEmbed)
+        testSubreddit = [match.group(1) for match in matches]
+        logging.info(f"Subreddit(s) detected: '{testSubreddit}'")
+        logging.info(f"Original message: '{message.content}'")
+
+        # Validate all mentioned subreddits in one batched lookup
+        isvalid = await self.validatesubreddits(testSubreddit)
+
+        subreddits = []
+        for subreddit in testSubreddit:
+            # Popping the result skips repeat mentions of the same subreddit
+            if isvalid.pop(subreddit.lower(), False):
+                subreddits.append(subreddit)
+        if subreddits:
+            SubredditEmbed = self.buildSubredditEmbed(subreddits)
+            await message.channel.send(embed=SubredditEmbed)
+
+    async def vredditlinks(
+        self, message: discord.Message, matches: typing.List[typing.Match]
+    ):
+        """
+        This function is a coroutine
 
-        # Check to see if Reddit's stupid image/video hosting has added 'DashPlaylist.mpd'
-        # to the end of the URL, which links to a direct download (of nothing) rather
-        # than the web content
-        testVreddit = re.search(
-            r"(https?:\/\/v.redd.it\/.*)(DASHPlaylist.*$)", message.content
+        Message scanner callback for Reddit's image/video hosting adding 'DashPlaylist.mpd' to
+        the end of the file, which links to nothing. Reply with a link to the media without the
+        suffix
+        """
+        testVreddit = matches[0]
+        newURL = testVreddit.group(1)
+        logging.info(f"VReddit MPD detected: '{testVreddit.group(0)}'")
+        logging.info(f"Link converted to: {newURL}")
+        await message.channel.send(
+            f"Here {message.author.mention}, let me fix that v.redd.it link for you: {newURL}"
         )
-        if testVreddit:
-            newURL = testVreddit.group(1)
-            logging.info(f"VReddit MPD detected: '{testVreddit.group(0)}'")
-            logging.info(f"Link converted to: {newURL}")
-            await message.channel.send(
-                f"Here {message.author.mention}, let me fix that v.redd.it link for you: {newURL}"
-            )
 
-    @staticmethod
-    def _isvalidsubreddit(subreddit: str) -> bool:
+    async def isvalidsubreddit(self, subreddit: str) -> bool:
         """
+        This function is a coroutine
+
         Return True if subreddit resolves to a valid Reddit subreddit, else return False
+        """
+        return (await self.validatesubreddits((subreddit,)))[subreddit.lower()]
+
+    async def validatesubreddits(
+        self, subreddits: typing.Iterable[str]
+    ) -> typing.Dict[str, bool]:
+        """
+        This function is a coroutine
+
+        Return a dictionary of lowercase subreddit name: validity for the input subreddits
+
+        Cached results are used where available & the remaining subreddits are resolved in a
+        single batched request. Concurrent validations share any lookups already in flight
+        """
+        results = {}
+        waiting = {}
+        newkeys = []
+        for key in {subreddit.lower() for subreddit in subreddits}:
+            isvalid = self.subredditcache.get(key)
+            if isvalid is not None:
+                results[key] = isvalid
+            elif key in self._pendinglookups:
+                waiting[key] = self._pendinglookups[key]
+            else:
+                newkeys.append(key)
+
+        if newkeys:
+            lookup = asyncio.ensure_future(self._lookupsubreddits(newkeys))
+
+            def _release(_):
+                for key in newkeys:
+                    self._pendinglookups.pop(key, None)
 
-        If the JSON request times out or is API throttled, True is returned as a fallback
+            lookup.add_done_callback(_release)
+            for key in newkeys:
+                self._pendinglookups[key] = lookup
+                waiting[key] = lookup
+
+        # Shield the shared lookups so one cancelled waiter doesn't cancel them for the others
+        lookups = set(waiting.values())
+        batches = await asyncio.gather(*(asyncio.shield(lookup) for lookup in lookups))
+        for batch in batches:
+            results.update({key: batch[key] for key in batch if key in waiting})
+
+        return results
+
+    async def _lookupsubreddits(
+        self, keys: typing.List[str], batchsize: int = 100
+    ) -> typing.Dict[str, bool]:
+        """
+        This function is a coroutine
+
+        Query Reddit's info JSON to determine which of the input lowercase subreddit names
+        are valid & cache the results
+
+        Reddit's info endpoint accepts up to 100 subreddit names per request & only returns
+        the subreddits that exist. If a request fails, times out, or is API throttled, its
+        subreddits are assumed to be valid as a fallback and the results are not cached
         """
-        baseURL = URL("https://old.reddit.com/")
-        testURL = baseURL.with_path(f"/r/{subreddit}.json")
+        batches = []
+        for start in range(0, len(keys), batchsize):
+            stop = start + batchsize
+            batches.append(keys[start:stop])
+
+        results = {}
+        for found in await asyncio.gather(*map(self._fetchsubreddits, batches)):
+            results.update(found)
+
+        return results
+
+    async def _fetchsubreddits(self, keys: typing.List[str]) -> typing.Dict[str, bool]:
+        infoURL = URL("https://www.reddit.com/api/info.json").with_query(
+            {"sr_name": ",".join(keys)}
+        )
 
         headers = {"user-agent": "Wumbot JSON Fallback"}
-        r = requests.get(testURL, headers=headers).json()
         try:
-            msg = r["message"]
-            if msg.lower() == "not found":
-                logging.info(f"Invalid subreddit detected: '{subreddit}'")
-                return False
+            async with self.bot.webclient.get(infoURL, headers=headers) as resp:
+                resp.raise_for_status()
+                r = await resp.json(content_type=None)
+
+            found = {
+                child["data"]["display_name"].lower() for child in r["data"]["children"]
+            }
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logging.info(f"Could not validate subreddit(s) {keys}: {e!r}")
+            return dict.fromkeys(keys, True)
+        except (KeyError, TypeError):
+            logging.info(f"Unhandled Reddit response validating subreddit(s) {keys}")
+            return dict.fromkeys(keys, True)
+
+        results = {}
+        for key in keys:
+            results[key] = key in found
+            if results[key]:
+                self.subredditcache.set(key, True)
             else:
-                logging.info(f"Unhandled Reddit response: '{msg}'")
-                return True
-        except KeyError:
-            return True
+                logging.info(f"Invalid subreddit detected: '{key}'")
+                self.subredditcache.set(key, False, ttl=self.invalidsubredditttl)
+
+        return results
 
 
 def setup(bot):
@@ -1,5 +1,6 @@
 import logging
 import typing
+from datetime import timedelta
 from pathlib import Path
 
 import discord
@@ -20,8 +21,9 @@ class RLNewsParser(NewsParser):
         self.appID = 252_950
         self.psyonixstaff = ("dirkened", "psyonix devin")
 
+        self.maxpostedage = timedelta(days=180)
+
         self._parsername = "RL News"
-        self._loadconverter = URL
         self._saveconverter = str
         self._comparator = "url"
 
@@ -32,7 +34,12 @@ class RLNewsParser(NewsParser):
         appID = appID if appID is not None else self.appID
 
         news = await SteamNewsPost.asyncgetnewsforapp(
-            appID=appID, count=15, maxlength=600
+            appID=appID,
+            count=15,
+            maxlength=600,
+            webclient=self.webclient,
+            conditional=self.conditional,
+            validators=self.validators,
         )
         logging.info(f"{len(news)} {self._parsername} post(s) returned by Steam's API")
         officialnews = [
@@ -80,6 +87,9 @@ class RLNewsParser(NewsParser):
             f"A new {self._parsername} post has been released!", embed=postembed
         )
 
+    def digestentry(self, postobj: SteamNewsPost) -> str:
+        return f"[{postobj.title}]({postobj.url})"
+
     async def patchcheck(self):
         posts = await self.getofficialnews()
         await super().patchcheck(posts)
@@ -105,8 +115,11 @@ class RocketLeagueCommands(commands.Cog):
 
     @commands.command(hidden=True)
     async def checkRLpatch(self, ctx: commands.Context):
+        # Manual checks always fetch the full listing
+        parser = RLNewsParser(self.bot)
+        parser.conditional = False
         await ManualCheck.check(
-            ctx=ctx, toinvoke=RLNewsParser(self.bot).patchcheck, commandstr="RL news"
+            ctx=ctx, toinvoke=parser.patchcheck, commandstr="RL news"
         )
 
 
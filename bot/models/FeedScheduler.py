@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import random
+
+import aiohttp
+
+from bot.models.NewsParser import NewsParser, checkall
+
+
+class FeedScheduler:
+    def __init__(self, bot):
+        """
+        Bot-wide scheduler that polls each registered NewsParser on its own timer
+
+        Each parser runs in its own task. After a successful check the next poll is scheduled
+        using the parser's nextpoll(); after a failure the parser's retryinterval backs off
+        exponentially, up to its maxbackoff, and honors any Retry-After sent with a rate-limit
+        response. Every delay is randomized by the parser's polljitter so feeds don't all fire
+        at once
+        """
+        self.bot = bot
+
+        self._tasks = {}
+
+    def register(self, parser: NewsParser):
+        """
+        Start polling parser, if it isn't already registered
+        """
+        if parser in self._tasks:
+            return
+
+        self._tasks[parser] = self.bot.loop.create_task(self._pollloop(parser))
+        logging.info(f"{parser._parsername} registered with feed scheduler")
+
+    def unregister(self, parser: NewsParser):
+        """
+        Stop polling parser
+        """
+        task = self._tasks.pop(parser, None)
+        if task is not None:
+            task.cancel()
+            logging.info(f"{parser._parsername} unregistered from feed scheduler")
+
+    async def _pollloop(self, parser: NewsParser):
+        await self.bot.wait_until_ready()
+
+        # Stagger the first check so registered feeds don't all poll on startup
+        await asyncio.sleep(random.uniform(0, parser.pollinterval * parser.polljitter))
+
+        failures = 0
+        while not self.bot.is_closed():
+            error = (await checkall((parser,)))[0]
+            if error is None:
+                failures = 0
+                delay = parser.nextpoll()
+            else:
+                failures += 1
+                delay = self.backoff(parser, failures, error)
+                logging.info(
+                    f"{parser._parsername} check failed {failures} time(s) in a row, "
+                    f"retrying in {delay:.0f} seconds"
+                )
+
+            await asyncio.sleep(self.jitter(parser, delay))
+
+    @staticmethod
+    def backoff(parser: NewsParser, failures: int, error: BaseException) -> float:
+        """
+        Return the delay, in seconds, before retrying parser after consecutive failures
+
+        The parser's retryinterval is doubled for each failure after the first, up to its
+        maxbackoff. If the error is a rate-limit response carrying a Retry-After header, the
+        delay is at least as long as requested
+        """
+        delay = min(parser.retryinterval * 2 ** (failures - 1), parser.maxbackoff)
+
+        if isinstance(error, aiohttp.ClientResponseError) and error.headers:
+            try:
+                delay = max(delay, float(error.headers.get("Retry-After", 0)))
+            except ValueError:
+                # Retry-After may also be an HTTP date, fall back to the computed backoff
+                pass
+
+        return delay
+
+    @staticmethod
+    def jitter(parser: NewsParser, delay: float) -> float:
+        """
+        Return delay randomly spread by +/- the parser's polljitter fraction
+        """
+        spread = delay * parser.polljitter
+        return max(0, delay + random.uniform(-spread, spread))
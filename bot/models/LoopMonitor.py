@@ -0,0 +1,172 @@
+import asyncio
+import inspect
+import logging
+import statistics
+import sys
+import threading
+import time
+import traceback
+import typing
+from collections import deque
+from datetime import datetime
+
+import sentry_sdk
+
+
+class LoopMonitor:
+    def __init__(
+        self,
+        bot,
+        interval: float = 0.5,
+        slowthreshold: float = 0.25,
+        windowsize: int = 1200,
+        maxstalls: int = 10,
+    ):
+        """
+        Bot-wide event loop lag sampler & slow callback detector
+
+        A heartbeat task sleeps for interval seconds at a time & records how late the loop
+        wakes it up; the last windowsize lag samples are kept for reporting
+
+        A watchdog thread checks the heartbeat. If it's more than slowthreshold seconds late,
+        the loop is blocked by a callback that hasn't yielded, so the loop thread's stack is
+        captured & the innermost coroutine on it reported as the offender, to the log & to
+        Sentry when it's enabled. Once the loop resumes, the stall is logged & the last
+        maxstalls stalls are kept for reporting
+
+        A stall's duration is measured from when the heartbeat was due to wake up, so it's a
+        lower bound: blocking that started earlier in the heartbeat's sleep, up to interval
+        seconds, isn't counted
+        """
+        self.bot = bot
+        self.interval = interval
+        self.slowthreshold = slowthreshold
+        self.lags = deque(maxlen=windowsize)
+        self.stalls = deque(maxlen=maxstalls)
+        self.nstalls = 0
+
+        self._task = None
+        self._watchdog = None
+        self._stopping = None
+        self._lock = threading.Lock()
+        self._loopthreadID = None
+        self._lastbeat = None
+        self._stall = None
+
+    def start(self):
+        """
+        Start sampling the bot's event loop, if it isn't already being sampled
+        """
+        if self._task is None:
+            self._stopping = threading.Event()
+            self._task = self.bot.loop.create_task(self._heartbeat())
+            logging.info("Event loop monitor started")
+
+    def stop(self):
+        """
+        Stop sampling the bot's event loop
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._stopping.set()
+            logging.info("Event loop monitor stopped")
+
+    def summary(self) -> str:
+        """
+        Return a short, human readable summary of recent loop lag & stalls
+        """
+        lines = []
+        if self.lags:
+            lags = sorted(self.lags)
+            p99 = lags[max(1, round(0.99 * len(lags))) - 1]
+            lines.append(
+                f"Loop lag over {len(lags) * self.interval / 60:.0f} min: "
+                f"p50 {statistics.median(lags) * 1e3:.1f} ms, p99 {p99 * 1e3:.1f} ms, "
+                f"max {lags[-1] * 1e3:.1f} ms"
+            )
+        else:
+            lines.append("No loop lag samples yet")
+
+        lines.append(
+            f"{self.nstalls} stall(s) over {self.slowthreshold * 1e3:.0f} ms since startup"
+        )
+        for when, duration, offender, _ in reversed(self.stalls):
+            lines.append(f"  {when:%Y-%m-%d %H:%M:%S} {duration:.2f}+ s in {offender}")
+
+        return "\n".join(lines)
+
+    async def _heartbeat(self):
+        self._loopthreadID = threading.get_ident()
+        self._lastbeat = time.monotonic()
+        self._watchdog = threading.Thread(
+            target=self._watch,
+            args=(self._stopping,),
+            name="wumbot-loopmonitor",
+            daemon=True,
+        )
+        self._watchdog.start()
+
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._lastbeat = time.monotonic()
+            lag = max(0, self._lastbeat - start - self.interval)
+            self.lags.append(lag)
+
+            with self._lock:
+                stall, self._stall = self._stall, None
+
+            if stall is not None:
+                # Lower bound, the block may have started before the heartbeat was due
+                when, offender, stack = stall
+                self.stalls.append((when, lag, offender, stack))
+                logging.warning(
+                    f"Event loop unblocked after at least {lag:.2f} s in {offender}"
+                )
+
+    def _watch(self, stopping: threading.Event):
+        while not stopping.wait(self.slowthreshold / 2):
+            blocked = time.monotonic() - self._lastbeat - self.interval
+            if blocked < self.slowthreshold:
+                continue
+
+            with self._lock:
+                if self._stall is not None:
+                    # Already reported, wait for the loop to resume
+                    continue
+
+                frame = sys._current_frames().get(self._loopthreadID)
+                if frame is None:
+                    continue
+
+                offender = self._findoffender(frame)
+                stack = "".join(traceback.format_stack(frame, limit=20))
+                self._stall = (datetime.utcnow(), offender, stack)
+                self.nstalls += 1
+
+            message = f"Event loop blocked for over {blocked:.2f} s by {offender}"
+            logging.warning(f"{message}, loop thread stack:\n{stack}")
+            sentry_sdk.capture_message(f"{message}\n{stack}", level="warning")
+
+    @staticmethod
+    def _findoffender(frame: typing.Any) -> str:
+        """
+        Return a description of the innermost coroutine in frame's stack, or of frame itself
+        if the loop is running a plain callback
+        """
+        innermost = frame
+        while frame is not None:
+            if frame.f_code.co_flags & inspect.CO_COROUTINE:
+                code = frame.f_code
+                return f"coroutine {code.co_name} ({code.co_filename}:{frame.f_lineno})"
+            frame = frame.f_back
+
+        # A plain callback blocking in a builtin (e.g. time.sleep) leaves asyncio's Handle._run
+        # as the innermost Python frame, report the handle's callback instead
+        handle = innermost.f_locals.get("self")
+        if isinstance(handle, asyncio.Handle):
+            return f"callback {getattr(handle, '_callback', handle)!r}"
+
+        code = innermost.f_code
+        return f"callback {code.co_name} ({code.co_filename}:{innermost.f_lineno})"
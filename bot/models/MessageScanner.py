@@ -0,0 +1,124 @@
+import logging
+import re
+import typing
+from collections import OrderedDict
+
+import discord
+
+
+class MessageScanner:
+    def __init__(self, bot):
+        """
+        Bot-wide scanner for link & text detectors in incoming messages
+
+        Cogs register a named detector (a regex pattern & an async callback) rather than each
+        scanning every message in their own on_message listener. Registered patterns are
+        compiled once, & matches are dispatched to the owning detector's callback
+
+        Each message is lowercased & checked against the detectors' prefilter substrings once.
+        Messages that don't contain any registered prefilter are skipped, otherwise only the
+        detectors whose prefilters appear run their pattern. Detectors scan independently, so a
+        match for one doesn't hide another's. The bot's own messages are ignored
+        """
+        self.bot = bot
+
+        # name: (compiled pattern, callback, prefilters)
+        self._detectors = OrderedDict()
+        self._prefilters = None
+
+        self.bot.add_listener(self.on_message, "on_message")
+
+    def register(
+        self,
+        name: str,
+        pattern: str,
+        callback: typing.Callable,
+        flags: int = 0,
+        prefilters: typing.Iterable[str] = (),
+    ):
+        """
+        Register a detector, replacing any existing detector with the same name
+
+        name must be a valid Python identifier. flags are passed to re.compile with pattern
+
+        callback is a coroutine function called as callback(message, matches), where matches is
+        a list of re.Match objects from the detector's own pattern, so its groups are numbered
+        as they would be in pattern
+
+        prefilters is an iterable of substrings, at least one of which must appear in a message
+        for the pattern to match. If no prefilters are given, every message is scanned
+        """
+        if not name.isidentifier():
+            raise ValueError(
+                f"Invalid detector name: '{name}', must be a valid identifier"
+            )
+
+        self._detectors[name] = (
+            re.compile(pattern, flags),
+            callback,
+            tuple(prefilter.lower() for prefilter in prefilters),
+        )
+        self._buildprefilters()
+        logging.info(f"'{name}' detector registered with message scanner")
+
+    def unregister(self, name: str):
+        """
+        Remove the named detector, if it is registered
+        """
+        if self._detectors.pop(name, None) is not None:
+            self._buildprefilters()
+            logging.info(f"'{name}' detector unregistered from message scanner")
+
+    def scan(self, content: str) -> typing.Dict[str, typing.List[typing.Match]]:
+        """
+        Scan content with all registered detectors
+
+        Return a dictionary of detector name: list of matches, for detectors that matched
+
+        Each detector whose prefilters appear in content (or that has none) runs its own
+        pattern over the whole message, so detectors' matches may overlap
+        """
+        if not self._detectors:
+            return {}
+
+        lowered = content.lower()
+        if self._prefilters is not None:
+            if not any(prefilter in lowered for prefilter in self._prefilters):
+                return {}
+
+        found = OrderedDict()
+        for name, (regex, _, prefilters) in self._detectors.items():
+            if prefilters and not any(prefilter in lowered for prefilter in prefilters):
+                continue
+
+            matches = list(regex.finditer(content))
+            if matches:
+                found[name] = matches
+
+        return found
+
+    async def on_message(self, message: discord.Message):
+        # Avoid self-replies
+        if message.author.id == self.bot.user.id:
+            return
+
+        for name, matches in self.scan(message.content).items():
+            try:
+                await self._detectors[name][1](message, matches)
+            except Exception:
+                logging.exception(f"'{name}' detector callback failed")
+
+    def _buildprefilters(self):
+        """
+        Build the combined prefilter that lets messages no detector could match be skipped
+        """
+        prefilters = set()
+        for _, _, detectorprefilters in self._detectors.values():
+            if not detectorprefilters:
+                # A detector without prefilters has to see every message
+                self._prefilters = None
+                return
+
+            prefilters.update(detectorprefilters)
+
+        self._prefilters = tuple(prefilters)
@@ -1,69 +1,245 @@
 import asyncio
-import json
 import logging
+import time
 import typing
+from datetime import datetime
+
+import discord
+
+from bot.models.NewsStorage import PostedIndex
+from bot.utils import Metrics
+from bot.utils.ValidatorCache import StagedValidators
+
+# Discord's embed description limit, characters
+DIGESTLENGTH = 2048
 
 
 class NewsParser:
     def __init__(self, bot):
         self.bot = bot
-        self.postednews = []
+        self.webclient = bot.webclient
+        self.postqueue = bot.postqueue
+        self.conditional = True
+        self.maxposted = None
+        self.maxpostedage = None
+        self.postchannelID = None
+        self.digestthreshold = 5
+        self.checktimeout = 300
+        self.pollinterval = 3600
+        self.polljitter = 0.1
+        self.retryinterval = 300
+        self.maxbackoff = 6 * 3600
+        self.postednews = PostedIndex()
+        self.storagebackend = bot.newsstorage
+        self.storage = None
 
         self._parsername = None
-        self._loadconverter = None
         self._saveconverter = None
         self._comparator = None
+        self._validators = None
+
+    @property
+    def validators(self) -> StagedValidators:
+        """
+        The parser's own view of its WebClient's validator cache, for conditional fetches
+
+        Validators from a fetch are only stored once patchcheck has posted everything in it,
+        so a failed check's response isn't answered with a 304 on the next check
+        """
+        # Created on first use, child parsers define their name after init
+        if self._validators is None:
+            self._validators = StagedValidators(
+                self.webclient.validators, self._parsername
+            )
+
+        return self._validators
 
     def loadposted(self):
-        if self.logJSONpath.exists():
-            with self.logJSONpath.open(mode="r") as fID:
-                savednews = [self._loadconverter(post) for post in json.load(fID)]
-
-            if savednews:
-                self.postednews = savednews
-                logging.info(
-                    f"Loaded {len(self.postednews)} {self._parsername} from '{self.logJSONpath}'"
-                )
-            else:
-                logging.info(f"No posted {self._parsername} found in JSON log")
-        else:
-            logging.info(f"{self._parsername} log JSON does not yet exist")
+        """
+        Load posted news from the parser's storage into self.postednews
+
+        The storage's index is authoritative once loaded, file-backed storage is only re-read
+        if it has changed since it was last loaded or written by this parser
+        """
+        # Storage is created on first use, child parsers define their log paths after init
+        if self.storage is None:
+            self.storage = self.storagebackend(self)
+
+        self.postednews = self.storage.load()
 
     def saveposted(self):
-        if self.postednews:
-            with self.logJSONpath.open(mode="w") as fID:
-                json.dump([self._saveconverter(post) for post in self.postednews], fID)
-            logging.info(f"Saved {len(self.postednews)} {self._parsername} post(s)")
-        else:
-            logging.info(f"No {self._parsername} to save")
+        """
+        Rewrite the parser's storage from self.postednews
+        """
+        self.storage.compact()
+        logging.info(f"Saved {len(self.postednews)} {self._parsername} post(s)")
+
+    def isposted(self, key: str) -> bool:
+        """
+        Return True if key is in the posted news index
+
+        Can be given to fetchers that parse incrementally as their known keys predicate. The
+        index isn't reloaded, call loadposted before fetching
+        """
+        return key in self.postednews
+
+    def nextpoll(self) -> float:
+        """
+        Return the delay, in seconds, before the next scheduled check after a successful one
+
+        Defaults to pollinterval, parsers can override this to poll adaptively
+        """
+        return self.pollinterval
+
+    def postkey(self, post: typing.Any) -> str:
+        """
+        Return the posted news index key for post, as its comparator attribute passed through
+        the parser's save converter
+        """
+        return self._saveconverter(getattr(post, self._comparator))
 
     async def patchcheck(self, posts):
         logging.info(f"{self._parsername} check coroutine invoked")
         self.loadposted()
 
-        newposts = [
-            post
-            for post in posts
-            if getattr(post, self._comparator) not in self.postednews
-        ]
+        newposts = []
+        newkeys = set()
+        for post in posts:
+            key = self.postkey(post)
+            # Touching keys that are still listed upstream keeps them inside the retention window
+            if not self.postednews.touch(key) and key not in newkeys:
+                newposts.append(post)
+                newkeys.add(key)
         logging.info(f"Found {len(newposts)} new {self._parsername} to post")
+        metrics = Metrics.getregistry()
+        metrics.inc("wumbot_new_posts_total", len(newposts))
 
         if newposts:
-            for post in reversed(
-                newposts
-            ):  # Attempt to get close to posting in chronological order
-                await self.postembed(post)
-                self.postednews.append(
-                    self._loadconverter(getattr(post, self._comparator))
-                )
+            async with self.postqueue.channel(self.postchannelID):
+                if len(newposts) > self.digestthreshold:
+                    # Coalesce a backlog (e.g. after downtime) into one message
+                    logging.info(
+                        f"Posting {len(newposts)} {self._parsername} as a digest"
+                    )
+                    metrics.inc("wumbot_digests_total")
+                    with metrics.timer("wumbot_post_send_seconds"):
+                        await self.postdigest(newposts)
+
+                    for post in newposts:
+                        self._markposted(post)
+                else:
+                    for post in reversed(
+                        newposts
+                    ):  # Attempt to get close to posting in chronological order
+                        with metrics.timer("wumbot_post_send_seconds"):
+                            await self.postembed(post)
+
+                        # Persist each post as it's sent so a failure partway through doesn't
+                        # repost
+                        self._markposted(post)
+
+        # Only prune against a fresh listing, an empty one (e.g. an unchanged feed) can't vouch
+        # for which keys are still listed upstream
+        if posts and self.postednews.prune():
+            self.saveposted()
+
+        # Everything fetched for this check has been posted
+        self.validators.commit()
 
+    def digestentry(self, post: typing.Any) -> str:
+        """
+        Return the line describing post in a digest of new posts
+
+        Defaults to str(post), parsers can override this to e.g. link to the post
+        """
+        return str(post)
+
+    async def postdigest(self, posts: typing.List = None, channelID: int = None):
+        """
+        Generate & send a single embed listing the input posts, newest first
+
+        Entries that don't fit in the embed's description are summarized as a count
+        """
+        channelID = channelID if channelID is not None else self.postchannelID
+        if not posts:
+            raise ValueError("No posts provided")
+
+        postchannel = self.bot.get_channel(channelID)
+
+        lines = []
+        length = 0
+        for idx, post in enumerate(posts):
+            line = f"\N{BULLET} {self.digestentry(post)}"
+            # Leave room for the "& N more" line
+            if length + len(line) + 1 > DIGESTLENGTH - 32:
+                lines.append(f"& {len(posts) - idx} more")
+                break
+
+            lines.append(line)
+            length += len(line) + 1
+
+        postembed = discord.Embed(
+            title=f"{len(posts)} new {self._parsername}",
+            color=discord.Color(0x9C4AF7),
+            description="\n".join(lines),
+        )
+        await postchannel.send(
+            f"{len(posts)} new {self._parsername} have been released!", embed=postembed
+        )
+
+    def _markposted(self, post: typing.Any):
+        self.storage.append(self.postkey(post), datetime.utcnow(), self.postchannelID)
+        if self.storage.needscompaction():
             self.saveposted()
 
 
+async def checkall(parsers: typing.Iterable) -> typing.List:
+    """
+    This function is a coroutine
+
+    Run patchcheck() for all input parsers concurrently
+
+    Each check is limited to its parser's checktimeout (seconds) & failures are isolated, a
+    parser that raises or times out is logged without affecting the others
+
+    A failed check's staged validators are discarded, so its next fetch isn't answered with a
+    304
+
+    Returns a list with the exception raised by each parser, in input order, or None if its
+    check succeeded
+
+    Each check runs in its own task with the parser's name set as the current Metrics feed, so
+    everything it records is labelled with its feed, & its duration is recorded by outcome
+    """
+
+    async def _check(parser: NewsParser) -> typing.Optional[BaseException]:
+        Metrics.currentfeed.set(parser._parsername)
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            await asyncio.wait_for(parser.patchcheck(), parser.checktimeout)
+        except asyncio.TimeoutError as e:
+            logging.error(
+                f"{parser._parsername} check timed out after {parser.checktimeout} seconds"
+            )
+            outcome = "timeout"
+            parser.validators.discard()
+            return e
+        except Exception as e:
+            logging.exception(f"{parser._parsername} check failed")
+            outcome = "error"
+            parser.validators.discard()
+            return e
+        finally:
+            Metrics.getregistry().observe(
+                "wumbot_check_seconds", time.perf_counter() - start, outcome=outcome
+            )
+
+    return await asyncio.gather(*(_check(parser) for parser in parsers))
+
+
 async def patchchecktimer(client, parsers: typing.Tuple = (), sleepseconds: int = 3600):
     await client.wait_until_ready()
     while not client.is_closed():
-        for p in parsers:
-            await p.patchcheck()
-
+        await checkall(parsers)
         await asyncio.sleep(sleepseconds)
@@ -0,0 +1,529 @@
+import functools
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import typing
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bot.utils import Helpers
+
+
+class PostedIndex:
+    def __init__(self, maxentries: int = None, maxage: timedelta = None):
+        """
+        Index of posted news keys, mapped to the UTC datetime each key was last seen
+
+        Membership checks are O(1). Keys are kept in least to most recently seen order so the
+        optional retention window can be applied by prune():
+            * maxentries keeps only the most recently seen keys
+            * maxage drops keys that have not been seen for longer than the timedelta
+
+        A retention window should comfortably exceed what the upstream feed returns, otherwise
+        a key may be pruned while it is still listed and be posted again
+        """
+        self.maxentries = maxentries
+        self.maxage = maxage
+
+        self._index = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __iter__(self) -> typing.Iterator:
+        return iter(self._index)
+
+    def items(self) -> typing.ItemsView:
+        return self._index.items()
+
+    def recent(self, n: int) -> typing.List[str]:
+        """
+        Return up to n keys, most recently seen first
+        """
+        return list(itertools.islice(reversed(self._index), n))
+
+    def add(self, key: str, seen: datetime = None):
+        """
+        Add key to the index, marking it as most recently seen
+        """
+        self._index[key] = seen if seen is not None else datetime.utcnow()
+        self._index.move_to_end(key)
+
+    def touch(self, key: str, seen: datetime = None) -> bool:
+        """
+        Mark key as most recently seen if it is in the index
+
+        Return True if key is in the index, else return False
+        """
+        if key not in self._index:
+            return False
+
+        self.add(key, seen)
+        return True
+
+    def prune(self, now: datetime = None) -> int:
+        """
+        Drop keys outside of the retention window & return the number of keys dropped
+        """
+        now = now if now is not None else datetime.utcnow()
+
+        dropped = 0
+        if self.maxage is not None:
+            while self._index and now - next(iter(self._index.values())) > self.maxage:
+                self._index.popitem(last=False)
+                dropped += 1
+
+        if self.maxentries is not None:
+            while len(self._index) > self.maxentries:
+                self._index.popitem(last=False)
+                dropped += 1
+
+        return dropped
+
+
+class _FileStorage:
+    def __init__(self, logpath: Path, maxentries: int = None, maxage: timedelta = None):
+        """
+        Base class for file-backed NewsParser storage
+
+        The storage owns an in-memory PostedIndex, which is authoritative once loaded. The log
+        is only re-read if its modification time or size has changed since this storage last
+        read or wrote it
+        """
+        self.logpath = logpath
+        self.index = PostedIndex(maxentries, maxage)
+
+        self._logstat = False  # Sentinel, None is used for a log that does not exist
+
+    def load(self) -> PostedIndex:
+        """
+        Return the storage's index, reloading it first if the log has changed
+        """
+        if self._statlog() == self._logstat:
+            return self.index
+
+        index = PostedIndex(self.index.maxentries, self.index.maxage)
+        for key, seen in self._readentries():
+            index.add(key, seen)
+
+        self.index = index
+        if self.index:
+            logging.info(f"Loaded {len(self.index)} entries from '{self.logpath}'")
+        else:
+            logging.info(f"No entries found in '{self.logpath}'")
+
+        return self.index
+
+    def needscompaction(self) -> bool:
+        return False
+
+    def _readentries(self) -> typing.List[typing.Tuple[str, datetime]]:
+        raise NotImplementedError
+
+    def _statlog(self) -> typing.Optional[typing.Tuple]:
+        try:
+            logstat = self.logpath.stat()
+        except FileNotFoundError:
+            return None
+
+        return logstat.st_mtime_ns, logstat.st_size
+
+    def _atomicwrite(self, entries: typing.Iterable[typing.Tuple[str, datetime]], dump):
+        Helpers.atomicwrite(self.logpath, functools.partial(dump, entries))
+        self._logstat = self._statlog()
+
+    @staticmethod
+    def _parseentry(
+        entry: typing.Any, loadtime: datetime
+    ) -> typing.Tuple[str, datetime]:
+        # Entries are stored as [key, ISO 8601 last seen] pairs. Older JSON logs saved bare
+        # keys, which are treated as seen on load
+        if isinstance(entry, list):
+            return entry[0], datetime.fromisoformat(entry[1])
+        else:
+            return entry, loadtime
+
+
+class JSONStorage(_FileStorage):
+    def __init__(self, logpath: Path, maxentries: int = None, maxage: timedelta = None):
+        """
+        NewsParser storage as a single JSON array of [key, last seen] pairs
+
+        Every write rewrites the whole array, atomically
+        """
+        super().__init__(logpath, maxentries, maxage)
+        self._pending = False
+
+    @staticmethod
+    def fromparser(parser: typing.Any) -> "JSONStorage":
+        return JSONStorage(parser.logJSONpath, parser.maxposted, parser.maxpostedage)
+
+    def append(self, key: str, seen: datetime, channel: int = None):
+        """
+        Add a new entry to the index, a JSON array can only be written whole so the entry is
+        persisted by the next compact()
+        """
+        self.index.add(key, seen)
+        self._pending = True
+
+    def needscompaction(self) -> bool:
+        return self._pending
+
+    def compact(self):
+        """
+        Atomically rewrite the log from the index
+        """
+        self._atomicwrite(
+            [[key, seen.isoformat()] for key, seen in self.index.items()], json.dump
+        )
+        self._pending = False
+
+    def _readentries(self) -> typing.List[typing.Tuple[str, datetime]]:
+        self._logstat = self._statlog()
+        if self._logstat is None:
+            return []
+
+        with self.logpath.open(mode="r") as fID:
+            savednews = json.load(fID)
+
+        loadtime = datetime.utcnow()
+        return [self._parseentry(entry, loadtime) for entry in savednews]
+
+
+class JournalStorage(_FileStorage):
+    def __init__(
+        self,
+        logpath: Path,
+        maxentries: int = None,
+        maxage: timedelta = None,
+        legacypath: Path = None,
+        compactevery: int = 50,
+    ):
+        """
+        NewsParser storage as an append-only, line-delimited journal of [key, last seen] pairs
+
+        New posts are appended & flushed to disk one line at a time. The journal is compacted
+        (rewritten from the index & atomically swapped in) after compactevery appends, or
+        whenever the parser prunes its index
+
+        If the journal does not exist but a JSON log does at legacypath, the JSON log is
+        migrated into the journal on load & renamed with a '.migrated' suffix
+        """
+        super().__init__(logpath, maxentries, maxage)
+        self.legacypath = legacypath
+        self.compactevery = compactevery
+
+        self._appends = 0
+
+    @staticmethod
+    def fromparser(parser: typing.Any) -> "JournalStorage":
+        return JournalStorage(
+            parser.logJSONpath.with_suffix(".jsonl"),
+            parser.maxposted,
+            parser.maxpostedage,
+            legacypath=parser.logJSONpath,
+        )
+
+    def append(self, key: str, seen: datetime, channel: int = None):
+        """
+        Add a new entry to the index, append it to the journal & flush it to disk
+        """
+        self.index.add(key, seen)
+        with self.logpath.open(mode="a") as fID:
+            fID.write(f"{json.dumps([key, seen.isoformat()])}\n")
+            fID.flush()
+            os.fsync(fID.fileno())
+
+        self._logstat = self._statlog()
+        self._appends += 1
+
+    def needscompaction(self) -> bool:
+        return self._appends >= self.compactevery
+
+    def compact(self):
+        """
+        Atomically rewrite the journal from the index
+        """
+        self._atomicwrite(self.index.items(), self._dumpjournal)
+        self._appends = 0
+
+    def _readentries(self) -> typing.List[typing.Tuple[str, datetime]]:
+        if not self.logpath.exists() and self.legacypath and self.legacypath.exists():
+            self._migrate()
+
+        self._logstat = self._statlog()
+        self._appends = 0
+        if self._logstat is None:
+            return []
+
+        entries = []
+        loadtime = datetime.utcnow()
+        with self.logpath.open(mode="r") as fID:
+            for line in fID:
+                if not line.strip():
+                    continue
+
+                try:
+                    entries.append(self._parseentry(json.loads(line), loadtime))
+                except ValueError:
+                    # Most likely a line torn by a crash mid-append, nothing after it was written
+                    logging.info(f"Skipping malformed journal line in '{self.logpath}'")
+
+        return entries
+
+    def _migrate(self):
+        legacy = JSONStorage(self.legacypath)._readentries()
+        self._atomicwrite(legacy, self._dumpjournal)
+
+        migratedpath = self.legacypath.with_name(f"{self.legacypath.name}.migrated")
+        os.replace(self.legacypath, migratedpath)
+        logging.info(
+            f"Migrated {len(legacy)} entries from '{self.legacypath}' to '{self.logpath}'"
+        )
+
+    @staticmethod
+    def _dumpjournal(
+        entries: typing.Iterable[typing.Tuple[str, datetime]], fID: typing.IO
+    ):
+        for key, seen in entries:
+            fID.write(f"{json.dumps([key, seen.isoformat()])}\n")
+
+
+class SQLiteIndex:
+    def __init__(
+        self, storage: "SQLiteStorage", maxentries: int = None, maxage: timedelta = None
+    ):
+        """
+        PostedIndex interface over a parser's rows in the SQLite posted news table
+
+        Every operation is an indexed query against the database, nothing is held in memory
+        """
+        self.storage = storage
+        self.maxentries = maxentries
+        self.maxage = maxage
+
+    def __contains__(self, key: str) -> bool:
+        return (
+            self.storage._execute(
+                "SELECT 1 FROM postednews WHERE parser = ? AND key = ?",
+                (self.storage.parsername, key),
+            ).fetchone()
+            is not None
+        )
+
+    def __len__(self) -> int:
+        return self.storage._execute(
+            "SELECT COUNT(*) FROM postednews WHERE parser = ?",
+            (self.storage.parsername,),
+        ).fetchone()[0]
+
+    def __iter__(self) -> typing.Iterator:
+        return (key for key, _ in self.items())
+
+    def items(self) -> typing.Iterator:
+        rows = self.storage._execute(
+            "SELECT key, lastseen FROM postednews WHERE parser = ? ORDER BY lastseen",
+            (self.storage.parsername,),
+        )
+        return ((key, datetime.fromisoformat(lastseen)) for key, lastseen in rows)
+
+    def recent(self, n: int) -> typing.List[str]:
+        """
+        Return up to n keys, most recently seen first
+        """
+        rows = self.storage._execute(
+            "SELECT key FROM postednews WHERE parser = ? ORDER BY lastseen DESC LIMIT ?",
+            (self.storage.parsername, n),
+        )
+        return [key for (key,) in rows]
+
+    def add(self, key: str, seen: datetime = None, channel: int = None):
+        """
+        Add key to the index, marking it as most recently seen
+        """
+        seen = SQLiteStorage._timestamp(seen)
+        with self.storage.connection:
+            self.storage._execute(
+                "INSERT OR REPLACE INTO postednews (parser, key, posted, lastseen, channel) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.storage.parsername, key, seen, seen, channel),
+            )
+
+    def touch(self, key: str, seen: datetime = None) -> bool:
+        """
+        Mark key as most recently seen if it is in the index
+
+        Return True if key is in the index, else return False
+        """
+        with self.storage.connection:
+            cursor = self.storage._execute(
+                "UPDATE postednews SET lastseen = ? WHERE parser = ? AND key = ?",
+                (SQLiteStorage._timestamp(seen), self.storage.parsername, key),
+            )
+
+        return cursor.rowcount > 0
+
+    def prune(self, now: datetime = None) -> int:
+        """
+        Drop keys outside of the retention window & return the number of keys dropped
+        """
+        now = now if now is not None else datetime.utcnow()
+
+        dropped = 0
+        with self.storage.connection:
+            if self.maxage is not None:
+                dropped += self.storage._execute(
+                    "DELETE FROM postednews WHERE parser = ? AND lastseen < ?",
+                    (
+                        self.storage.parsername,
+                        SQLiteStorage._timestamp(now - self.maxage),
+                    ),
+                ).rowcount
+
+            if self.maxentries is not None:
+                dropped += self.storage._execute(
+                    "DELETE FROM postednews WHERE parser = ? AND key IN ("
+                    "SELECT key FROM postednews WHERE parser = ? "
+                    "ORDER BY lastseen DESC LIMIT -1 OFFSET ?)",
+                    (self.storage.parsername, self.storage.parsername, self.maxentries),
+                ).rowcount
+
+        return dropped
+
+
+class SQLiteStorage:
+    _connections = {}
+
+    def __init__(
+        self,
+        parsername: str,
+        dbpath: Path = Path("./log/wumbot.db"),
+        maxentries: int = None,
+        maxage: timedelta = None,
+        legacystorage: typing.Any = None,
+    ):
+        """
+        NewsParser storage as rows in a single SQLite database shared by all parsers
+
+        Posted news is stored in one table keyed by (parser, key), alongside the posted & last
+        seen timestamps and the channel posted to. The database uses WAL journaling & every
+        write is its own transaction. Dedup checks are indexed lookups, the parser's history
+        is never loaded into memory
+
+        If the table has no rows for parsername on first load, entries are imported from
+        legacystorage (e.g. the parser's JournalStorage), if provided
+        """
+        self.parsername = parsername
+        self.dbpath = dbpath
+        self.legacystorage = legacystorage
+        self.index = SQLiteIndex(self, maxentries, maxage)
+
+        self._loaded = False
+
+    @staticmethod
+    def fromparser(parser: typing.Any) -> "SQLiteStorage":
+        return SQLiteStorage(
+            parser._parsername,
+            maxentries=parser.maxposted,
+            maxage=parser.maxpostedage,
+            legacystorage=JournalStorage.fromparser(parser),
+        )
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        Return the shared connection to dbpath, creating the database schema if needed
+        """
+        dbkey = str(self.dbpath)
+        if dbkey not in SQLiteStorage._connections:
+            connection = sqlite3.connect(dbkey)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS postednews ("
+                    "parser TEXT NOT NULL, "
+                    "key TEXT NOT NULL, "
+                    "posted TEXT NOT NULL, "
+                    "lastseen TEXT NOT NULL, "
+                    "channel INTEGER, "
+                    "PRIMARY KEY (parser, key))"
+                )
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS postednews_lastseen "
+                    "ON postednews (parser, lastseen)"
+                )
+            SQLiteStorage._connections[dbkey] = connection
+
+        return SQLiteStorage._connections[dbkey]
+
+    def load(self) -> SQLiteIndex:
+        """
+        Return the storage's index, importing legacy entries on first load if needed
+        """
+        if not self._loaded:
+            self._loaded = True
+            if self.legacystorage is not None and not self.index:
+                self._migrate()
+
+        return self.index
+
+    def append(self, key: str, seen: datetime, channel: int = None):
+        """
+        Insert a new entry, committed immediately
+        """
+        self.index.add(key, seen, channel)
+
+    def needscompaction(self) -> bool:
+        return False
+
+    def compact(self):
+        """
+        No-op, every write is committed as it is made
+        """
+        pass
+
+    def history(self, limit: int = 25) -> typing.List[typing.Tuple]:
+        """
+        Return up to limit of the parser's most recently posted (key, posted, channel) rows
+        """
+        rows = self._execute(
+            "SELECT key, posted, channel FROM postednews WHERE parser = ? "
+            "ORDER BY posted DESC LIMIT ?",
+            (self.parsername, limit),
+        )
+        return [
+            (key, datetime.fromisoformat(posted), channel)
+            for key, posted, channel in rows
+        ]
+
+    def _execute(self, query: str, parameters: typing.Tuple = ()) -> sqlite3.Cursor:
+        return self.connection.execute(query, parameters)
+
+    def _migrate(self):
+        legacy = self.legacystorage.load()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO postednews (parser, key, posted, lastseen) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    (self.parsername, key, self._timestamp(seen), self._timestamp(seen))
+                    for key, seen in legacy.items()
+                ),
+            )
+
+        logging.info(
+            f"Imported {len(legacy)} {self.parsername} entries into '{self.dbpath}'"
+        )
+
+    @staticmethod
+    def _timestamp(dt: datetime = None) -> str:
+        # Fixed precision so stored timestamps compare correctly as strings
+        dt = dt if dt is not None else datetime.utcnow()
+        return dt.isoformat(timespec="microseconds")
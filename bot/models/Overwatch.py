@@ -1,12 +1,26 @@
+from __future__ import annotations
+
+import logging
 import re
 import typing
 from datetime import datetime
 
-import aiohttp
 import requests
 from bs4 import BeautifulSoup
 from yarl import URL
 
+from bot.utils import Executors, Metrics, ValidatorCache, WebClient
+
+# Parse patch notes with lxml when installed, it's much faster than BeautifulSoup & Python's
+# html.parser on the full patch notes page
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:
+    lxml = None
+
+HTMLPARSER = "lxml" if lxml is not None else "html.parser"
+
 
 class OWPatch:
     def __init__(
@@ -57,86 +71,248 @@ class OWPatch:
     async def asyncfromURL(
         inURL: typing.Union[str, URL] = URL(
             "https://playoverwatch.com/en-us/news/patch-notes/pc"
-        )
+        ),
+        webclient: WebClient.WebClient = None,
+        conditional: bool = False,
+        isknown: typing.Callable[[str], bool] = None,
+        validators: ValidatorCache.ValidatorCache = None,
+        known: typing.Container[str] = None,
     ) -> typing.List:
         """
         This function is a coroutine
 
         Return a list of OWPatch objects from Blizzard's Patch Notes
+
+        The page is fetched with WebClient.conditionalget, an empty list is returned without
+        parsing if it's unchanged since the last conditional fetch
+
+        See _parseOWpatchHTML for incremental parsing with isknown. Parsing runs in the bot-wide
+        CPU pool, so isknown is checked as patches are built from the worker's records. known is
+        a picklable container of known verpatches checked in the worker itself, so records for
+        patches older than the first known one aren't extracted at all
         """
         if not inURL:
             raise ValueError("No URL provided")
         inURL = URL(inURL)
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(inURL) as resp:
-                r = await resp.text()
+        async with WebClient.conditionalget(
+            inURL, webclient, conditional, validators
+        ) as resp:
+            if resp is None:
+                return []
 
-        return OWPatch._parseOWpatchHTML(r)
+            r = await resp.text()
+
+            # Parsing is CPU-bound, extract the raw records in the bot-wide CPU pool so the
+            # event loop isn't blocked & only build the patches we need here
+            with Metrics.getregistry().timer("wumbot_parse_seconds"):
+                records = await Executors.runcpubound(parsepatchrecords, r, known=known)
+                return OWPatch._frompatchrecords(records, isknown)
 
     @staticmethod
-    def _parseOWpatchHTML(inHTML: str) -> typing.List:
-        soup = BeautifulSoup(inHTML, "html.parser")
+    def _parseOWpatchHTML(
+        inHTML: str, parser: str = None, isknown: typing.Callable[[str], bool] = None
+    ) -> typing.List:
+        """
+        Parse a list of OWPatch objects from Blizzard's Patch Notes HTML
+
+        parser selects the HTML parser backend. "lxml" parses with lxml directly & is the
+        default if lxml is installed, any other value is used as BeautifulSoup's tree builder,
+        defaulting to Python's "html.parser"
+
+        Patches are listed newest first. If an isknown predicate is provided, parsing stops at
+        the first patch whose verpatch it returns True for, so older patches aren't built. The
+        known patch is included as the last item of the returned list, marking where the
+        listing overlaps what the caller has already seen
+        """
+        parser = parser if parser is not None else HTMLPARSER
+
+        if parser == "lxml":
+            records = OWPatch._lxmlpatchrecords(inHTML)
+        else:
+            records = OWPatch._souppatchrecords(inHTML, parser)
 
-        # Iterate over patches
-        patches = soup.find_all("div", class_="patch-notes-patch")
+        return OWPatch._frompatchrecords(records, isknown)
 
+    @staticmethod
+    def _frompatchrecords(
+        records: typing.Iterable[typing.Tuple],
+        isknown: typing.Callable[[str], bool] = None,
+    ) -> typing.List:
+        """
+        Build OWPatch objects from raw patch records, in order, stopping after the first patch
+        whose verpatch isknown returns True for
+        """
         patchobjs = []
-        for patch in patches:
-            # Get patch reference ID
-            patchref = patch.get("id")
-            # Get numeric reference to build BlizzTrack link later
-            patchref_num = patchref.split("-")[-1]
+        for record in records:
+            patch = OWPatch._frompatchrecord(*record)
+            patchobjs.append(patch)
+            if isknown is not None and isknown(patch.verpatch):
+                logging.info(f"Stopped parsing at known patch: {patch.verpatch}")
+                break
 
-            # Get version number from sidebar using patch reference ID
-            sidebaritem = soup.find("a", href=re.compile(f"#{patchref}")).parent
-            ver = sidebaritem.find("h3").get_text().split()[-1]
+        return patchobjs
 
-            # Generate full reference from version number & patch reference because
-            # Blizzard reuses version numbers for some patches
-            # e.g. 1.29.0.1.51948 and 1.29.0.1.51575
-            verpatch = f"{ver}.{patchref_num}"
+    @staticmethod
+    def _frompatchrecord(
+        patchref: str,
+        heading: str,
+        bannerdate: typing.Optional[str],
+        sidebardate: typing.Optional[str],
+        bannerstyle: typing.Optional[str],
+    ) -> OWPatch:
+        """
+        Build an OWPatch from the raw strings extracted for a patch by a parser backend
+        """
+        # Get numeric reference to build BlizzTrack link later
+        patchref_num = patchref.split("-")[-1]
 
-            # Get date
-            dateheader = patch.find("h2", class_="HeadingBanner-header")
-            if dateheader:
-                patchdate = datetime.strptime(dateheader.get_text(), "%B %d, %Y")
-            else:
-                # In the event there is no banner, the date is instead embedded in
-                # <h1>Overwatch Patch Notes – June 5, 2018</h1>
-                # Since we already have the sidebar entry, it's slightly simpler to get the date
-                # from that instead
-                patchdate = datetime.strptime(
-                    sidebaritem.find("p").get_text(), "%m/%d/%Y"
-                )
+        # Get version number from the sidebar heading, e.g. "Overwatch 1.29.0.1"
+        ver = heading.split()[-1]
+
+        verpatch = OWPatch._recordverpatch(patchref, heading)
+
+        # Get date
+        if bannerdate is not None:
+            patchdate = datetime.strptime(bannerdate, "%B %d, %Y")
+        else:
+            # In the event there is no banner, the date is instead embedded in
+            # <h1>Overwatch Patch Notes – June 5, 2018</h1>
+            # Since we already have the sidebar entry, it's slightly simpler to get the date
+            # from that instead
+            patchdate = datetime.strptime(sidebardate, "%m/%d/%Y")
+
+        # Get patch banner
+        # If there is a banner for the patch, it's embedded in the 'style' portion of the
+        # '.HeadingBanner' div
+        # e.g. <div class="HeadingBanner" style="background-image: url(https://link/to.jpg);">
+        patchbanner = None
+        if bannerstyle is not None:
+            m = re.search(r"url\(\"?([^\"]+)\"?\)", bannerstyle)
+            if m:
+                patchbanner = URL(m.group(1))
+
+        return OWPatch(
+            patchref,
+            ver,
+            verpatch,
+            patchdate,
+            OWPatch.getblizztrack(patchref_num),
+            patchbanner,
+        )
+
+    @staticmethod
+    def _recordverpatch(patchref: str, heading: str) -> str:
+        """
+        Return the verpatch of a raw patch record from its patch reference & sidebar heading
+        """
+        # Generate full reference from version number & patch reference because
+        # Blizzard reuses version numbers for some patches
+        # e.g. 1.29.0.1.51948 and 1.29.0.1.51575
+        return f"{heading.split()[-1]}.{patchref.split('-')[-1]}"
+
+    @staticmethod
+    def _souppatchrecords(inHTML: str, parser: str) -> typing.List[typing.Tuple]:
+        """
+        Extract raw patch records from Blizzard's Patch Notes HTML using BeautifulSoup
+        """
+        return OWPatch._souprecords(BeautifulSoup(inHTML, parser))
 
-            # Get patch banner
-            # If there is a banner for the patch, it's embedded in the 'style' portion of the
-            # '.HeadingBanner' div
-            # e.g. <div class="HeadingBanner" style="background-image: url(https://link/to.jpg);">
+    @staticmethod
+    def _souprecords(soup: BeautifulSoup) -> typing.List[typing.Tuple]:
+        # Index sidebar anchors by their href's fragment in one pass, so each patch's sidebar
+        # item is a dictionary lookup rather than a search of the whole document
+        sidebaranchors = {}
+        for anchor in soup.find_all("a", href=True):
+            _, hashmark, fragment = anchor["href"].partition("#")
+            if hashmark:
+                sidebaranchors.setdefault(fragment, anchor)
+
+        records = []
+        for patch in soup.find_all("div", class_="patch-notes-patch"):
+            patchref = patch.get("id")
+
+            # The sidebar heading & date are either inside the anchor or alongside it
+            sidebaritem = sidebaranchors[patchref]
+            if sidebaritem.find("h3") is None:
+                sidebaritem = sidebaritem.parent
+
+            heading = sidebaritem.find("h3").get_text()
+            sidebardate = sidebaritem.find("p")
+            dateheader = patch.find("h2", class_="HeadingBanner-header")
             patchbannerdiv = patch.select_one(".HeadingBanner")
-            if patchbannerdiv:
-                expr = r"url\(\"?([^\"]+)\"?\)"
-                m = re.search(expr, patchbannerdiv["style"])
-                if m:
-                    patchbanner = URL(m.group(1))
-                else:
-                    patchbanner = None
-            else:
-                patchbanner = None
-
-            patchobjs.append(
-                OWPatch(
+
+            records.append(
+                (
                     patchref,
-                    ver,
-                    verpatch,
-                    patchdate,
-                    OWPatch.getblizztrack(patchref_num),
-                    patchbanner,
+                    heading,
+                    dateheader.get_text() if dateheader is not None else None,
+                    sidebardate.get_text() if sidebardate is not None else None,
+                    patchbannerdiv.get("style") if patchbannerdiv is not None else None,
                 )
             )
 
-        return patchobjs
+        return records
+
+    @staticmethod
+    def _lxmlpatchrecords(inHTML: str) -> typing.Iterator[typing.Tuple]:
+        """
+        Extract raw patch records from Blizzard's Patch Notes HTML using lxml
+
+        Records are generated lazily, in page order, so callers can stop early
+        """
+        tree = lxml.html.fromstring(inHTML)
+
+        # Index sidebar anchors by their href's fragment in one pass
+        sidebaranchors = {}
+        for anchor in tree.iter("a"):
+            _, hashmark, fragment = anchor.get("href", "").partition("#")
+            if hashmark:
+                sidebaranchors.setdefault(fragment, anchor)
+
+        for patch in tree.iter("div"):
+            if OWPatch._hasclass(patch, "patch-notes-patch"):
+                yield OWPatch._lxmlrecord(patch, sidebaranchors[patch.get("id")])
+
+    @staticmethod
+    def _lxmlrecord(patch: typing.Any, sidebaranchor: typing.Any) -> typing.Tuple:
+        """
+        Extract the raw patch record for an lxml patch block & its sidebar anchor
+        """
+        # The sidebar heading & date are either inside the anchor or alongside it
+        sidebaritem = sidebaranchor
+        if sidebaritem.find(".//h3") is None:
+            sidebaritem = sidebaritem.getparent()
+
+        heading = "".join(sidebaritem.find(".//h3").itertext())
+        sidebardate = sidebaritem.find(".//p")
+        dateheader = OWPatch._findclass(patch, "HeadingBanner-header", tag="h2")
+        patchbannerdiv = OWPatch._findclass(patch, "HeadingBanner")
+
+        return (
+            patch.get("id"),
+            heading,
+            "".join(dateheader.itertext()) if dateheader is not None else None,
+            "".join(sidebardate.itertext()) if sidebardate is not None else None,
+            patchbannerdiv.get("style") if patchbannerdiv is not None else None,
+        )
+
+    @staticmethod
+    def _hasclass(element: typing.Any, classname: str) -> bool:
+        return classname in (element.get("class") or "").split()
+
+    @staticmethod
+    def _findclass(
+        element: typing.Any, classname: str, tag: str = None
+    ) -> typing.Optional[typing.Any]:
+        """
+        Return the first lxml descendant of element with the input class, or None
+        """
+        for descendant in element.iterdescendants(tag):
+            if OWPatch._hasclass(descendant, classname):
+                return descendant
+
+        return None
 
     @staticmethod
     def getblizztrack(patchref: str = None) -> URL:
@@ -150,3 +326,37 @@ class OWPatch:
 
         baseURL = URL("https://blizztrack.com/patch_notes/overwatch/")
         return baseURL / patchref
+
+
+def parsepatchrecords(
+    inHTML: str, parser: str = None, known: typing.Container[str] = None
+) -> typing.List[typing.Tuple]:
+    """
+    Extract the raw record for each patch in Blizzard's Patch Notes HTML
+
+    Records are tuples of strings, which are cheap to pickle, so this can be run in a worker
+    process with Executors.runcpubound. Build OWPatch objects from them with
+    OWPatch._frompatchrecords
+
+    parser selects the HTML parser backend, as for OWPatch._parseOWpatchHTML
+
+    Patches are listed newest first. If known is provided, extraction stops after the first
+    patch whose verpatch is in known, so records for older patches aren't extracted
+    """
+    parser = parser if parser is not None else HTMLPARSER
+
+    if parser == "lxml":
+        records = OWPatch._lxmlpatchrecords(inHTML)
+    else:
+        records = OWPatch._souppatchrecords(inHTML, parser)
+
+    if known is None:
+        return list(records)
+
+    extracted = []
+    for record in records:
+        extracted.append(record)
+        if OWPatch._recordverpatch(*record[:2]) in known:
+            break
+
+    return extracted
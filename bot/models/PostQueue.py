@@ -0,0 +1,29 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class PostQueue:
+    def __init__(self):
+        """
+        Bot-wide, per-channel queue for the posts sent by NewsParsers
+
+        Batches of posts to the same channel are sent one batch at a time, in the order they
+        were queued, & each batch's posts are sent one after another, so posts from parsers
+        sharing a channel aren't interleaved & each batch arrives in order. Batches for
+        different channels are sent concurrently
+
+        Rate limits are left to discord.py, which waits out the buckets Discord reports &
+        retries rate limited requests itself
+        """
+        self._locks = {}
+
+    @asynccontextmanager
+    async def channel(self, channelID: int):
+        """
+        Async context manager holding channelID's place in the queue for a batch of sends
+        """
+        if channelID not in self._locks:
+            self._locks[channelID] = asyncio.Lock()
+
+        async with self._locks[channelID]:
+            yield
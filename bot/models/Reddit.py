@@ -4,14 +4,16 @@ import json
 import logging
 import re
 import typing
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 
-import aiohttp
 import praw
+import prawcore
 import requests
 from yarl import URL
 
+from bot.utils import Executors, Metrics, ValidatorCache, WebClient
+
 
 class RedditPost:
     def __init__(
@@ -78,22 +80,15 @@ class RedditPRAW:
         """
         Helper class for PRAW instance
 
-        On instantiation, an attempt is made to authenticate using the input credential JSON
         Credential JSON should contain a 'RedditOAuth' key with an (ID, secret) tuple
 
-        The isauthenticated attribute can be queried to determine authentication status
+        PRAW authenticates on the first request & caches its OAuth token until it expires, so
+        instances should be kept & reused (see RedditClientManager)
+
+        The isauthenticated attribute can be queried to determine authentication status, as of
+        the most recent request. No request is made to check it
         """
-        # Try to get some submissions to check for correct authentication
         self.isauthenticated = True
-        try:
-            self.session.subreddit("python").hot(limit=1)
-        except praw.exceptions.ResponseException:
-            self.isauthenticated = False
-
-        if self.isauthenticated:
-            logging.info("Successful PRAW authentication")
-        else:
-            logging.info(f"PRAW received invalid credentials from '{credentialJSON}'")
 
     def getnewusersubmissions(
         self, username: str, limit: int = 25
@@ -109,6 +104,60 @@ class RedditPRAW:
 
         return self.session.redditor(username).submissions.new(limit=limit)
 
+    async def asyncgetnewusersubmissions(
+        self, username: str, limit: int = 25
+    ) -> typing.List[RedditPost]:
+        """
+        This function is a coroutine
+
+        Return a list of RedditPost objects from username's newest Reddit submissions
+
+        PRAW is blocking, so the listing is fetched & converted in the bot-wide thread pool
+
+        API call can be limited to a number of submissions, as specified by limit
+        """
+        return await Executors.runblocking(
+            self._newusersubmissionposts, username, limit
+        )
+
+    def _newusersubmissionposts(
+        self, username: str, limit: int
+    ) -> typing.List[RedditPost]:
+        # Conversion needs to happen off the loop too, PRAW lazily fetches missing attributes
+        try:
+            return [
+                RedditPost.fromPRAW(submission)
+                for submission in self.getnewusersubmissions(username, limit)
+            ]
+        except prawcore.exceptions.PrawcoreException as e:
+            if RedditPRAW._isauthfailure(e):
+                self.isauthenticated = False
+            raise
+
+    @staticmethod
+    async def asynccreate(
+        credentialJSON: Path = Path("./credentials.JSON"),
+    ) -> RedditPRAW:
+        """
+        This function is a coroutine
+
+        Return a new RedditPRAW instance, created in the bot-wide thread pool since loading
+        credentials & authenticating are blocking
+        """
+        return await Executors.runblocking(RedditPRAW, credentialJSON)
+
+    @staticmethod
+    def _isauthfailure(e: Exception) -> bool:
+        """
+        Return True if the PRAW exception was caused by Reddit rejecting our credentials
+        """
+        if isinstance(e, prawcore.exceptions.OAuthException):
+            return True
+        elif isinstance(e, prawcore.exceptions.ResponseException):
+            return e.response.status_code == 401
+        else:
+            return False
+
     @staticmethod
     def _loadCredentials(credentialJSON: Path) -> str:
         """
@@ -120,6 +169,86 @@ class RedditPRAW:
         return credentials["RedditOAuth"]
 
 
+class RedditClientManager:
+    def __init__(
+        self,
+        credentialJSON: Path = Path("./credentials.JSON"),
+        retryauth: timedelta = timedelta(hours=1),
+    ):
+        """
+        Manager for a single, long-lived RedditPRAW instance, WumbotClient holds one as its
+        redditmanager
+
+        Credentials are read & the PRAW instance created once, PRAW then caches its OAuth token
+        until expiry. If Reddit rejects the credentials (or they can't be loaded), the manager
+        reports the failure so callers can fall back to RedditJSON & doesn't try PRAW again
+        until retryauth has elapsed, at which point credentials are re-read
+        """
+        self.credentialJSON = credentialJSON
+        self.retryauth = retryauth
+
+        self._client = None
+        self._authfailed = None
+
+    @property
+    def isauthenticated(self) -> bool:
+        """
+        Return False if authentication has failed within the retry window, else return True
+
+        No request is made to check authentication status
+        """
+        if self._authfailed is None:
+            return True
+
+        return datetime.utcnow() - self._authfailed >= self.retryauth
+
+    async def asyncgetnewusersubmissions(
+        self, username: str, limit: int = 25
+    ) -> typing.Optional[typing.List[RedditPost]]:
+        """
+        This function is a coroutine
+
+        Return a list of RedditPost objects from username's newest Reddit submissions, using
+        the managed PRAW instance
+
+        Return None if PRAW can't authenticate, errors unrelated to authentication are raised
+        """
+        if not self.isauthenticated:
+            return None
+
+        try:
+            if self._client is None:
+                self._client = await RedditPRAW.asynccreate(self.credentialJSON)
+
+            posts = await self._client.asyncgetnewusersubmissions(username, limit)
+        except (OSError, KeyError, TypeError, IndexError) as e:
+            logging.info(
+                f"Could not load PRAW credentials from '{self.credentialJSON}': {e}"
+            )
+            self._markauthfailed()
+            return None
+        except prawcore.exceptions.PrawcoreException as e:
+            if not RedditPRAW._isauthfailure(e):
+                raise
+
+            logging.info(
+                f"PRAW received invalid credentials from '{self.credentialJSON}'"
+            )
+            self._markauthfailed()
+            return None
+
+        if self._authfailed is not None:
+            logging.info("Successful PRAW authentication")
+            self._authfailed = None
+
+        return posts
+
+    def _markauthfailed(self):
+        # Drop the client so credentials are re-read when authentication is retried
+        self._authfailed = datetime.utcnow()
+        self._client = None
+
+
 class RedditJSON:
     """
     Helper class for Reddit JSON methods
@@ -127,7 +256,11 @@ class RedditJSON:
 
     @staticmethod
     async def asyncfromJSON(
-        jsonURL: typing.Union[str, URL] = None, skipvalidation: bool = False
+        jsonURL: typing.Union[str, URL] = None,
+        skipvalidation: bool = False,
+        webclient: WebClient.WebClient = None,
+        conditional: bool = False,
+        validators: ValidatorCache.ValidatorCache = None,
     ) -> typing.List:
         """
         This function is a coroutine
@@ -143,27 +276,37 @@ class RedditJSON:
 
         The skipvalidation flag allows you to skip the URL validation if it has already
         been validated
+
+        The listing is fetched with WebClient.conditionalget, an empty list is returned without
+        parsing if it's unchanged since the last conditional fetch
         """
         if not skipvalidation:
             jsonURL = RedditJSON._validateURL(jsonURL, checkJSON=True)
 
         headers = {"user-agent": "Wumbot JSON Fallback"}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(jsonURL, headers=headers) as resp:
-                jsonresponse = await resp.json()
+        async with WebClient.conditionalget(
+            jsonURL, webclient, conditional, validators, headers=headers
+        ) as resp:
+            if resp is None:
+                return []
 
-        if isinstance(jsonresponse, list):
-            # Reddit Post JSON contains a list of 2 dicts, one for the post and one for the comments
-            # Comments are ignored for now
-            postlist = jsonresponse[0]["data"]["children"]
-        else:
-            # Everything else should just be a bare dictionary
-            postlist = jsonresponse["data"]["children"]
+            jsonresponse = await resp.json()
 
-        return [RedditPost.fromJSON(post) for post in postlist]
+            if isinstance(jsonresponse, list):
+                # Reddit Post JSON contains a list of 2 dicts, one for the post and one for the
+                # comments. Comments are ignored for now
+                postlist = jsonresponse[0]["data"]["children"]
+            else:
+                # Everything else should just be a bare dictionary
+                postlist = jsonresponse["data"]["children"]
+
+            with Metrics.getregistry().timer("wumbot_parse_seconds"):
+                return [RedditPost.fromJSON(post) for post in postlist]
 
     @staticmethod
-    async def asyncfromURL(inURL: str = None) -> typing.List:
+    async def asyncfromURL(
+        inURL: str = None, webclient: WebClient.WebClient = None
+    ) -> typing.List:
         """
         This function is a coroutine
 
@@ -178,10 +321,14 @@ class RedditJSON:
         """
         inURL = RedditJSON._validateURL(inURL, checkJSON=False)
         if RedditJSON._isredditJSON(inURL):
-            return await RedditJSON.asyncfromJSON(inURL, skipvalidation=True)
+            return await RedditJSON.asyncfromJSON(
+                inURL, skipvalidation=True, webclient=webclient
+            )
         else:
             return await RedditJSON.asyncfromJSON(
-                URL(inURL.human_repr() + ".json"), skipvalidation=True
+                URL(inURL.human_repr() + ".json"),
+                skipvalidation=True,
+                webclient=webclient,
             )
 
     @staticmethod
@@ -2,10 +2,11 @@ import re
 import typing
 from datetime import datetime
 
-import aiohttp
 import requests
 from yarl import URL
 
+from bot.utils import Metrics, ValidatorCache, WebClient
+
 
 class SteamNewsPost:
     def __init__(
@@ -51,6 +52,9 @@ class SteamNewsPost:
         count: int = 10,
         maxlength: int = 300,
         format: str = "json",
+        webclient: WebClient.WebClient = None,
+        conditional: bool = False,
+        validators: ValidatorCache.ValidatorCache = None,
         **kwargs,
     ) -> typing.List:
         """
@@ -60,6 +64,9 @@ class SteamNewsPost:
 
         Additional keyword arguments are accepted but not used to generate the API query
 
+        The news is fetched with WebClient.conditionalget, an empty list is returned without
+        parsing if it's unchanged since the last conditional fetch
+
         Results are returned as a list of SteamNewsPost objects
         """
         apiURL = URL("https://api.steampowered.com/ISteamNews/GetNewsForApp/v0002/")
@@ -70,12 +77,23 @@ class SteamNewsPost:
             "maxlength": maxlength,
             "format": format,
         }
-        async with aiohttp.ClientSession() as session:
-            async with session.get(apiURL.with_query(paramdict)) as resp:
-                rawdict = await resp.json()
-
-        if rawdict["appnews"] and rawdict["appnews"]["newsitems"]:
-            return [SteamNewsPost(**item) for item in rawdict["appnews"]["newsitems"]]
+        queryURL = apiURL.with_query(paramdict)
+        async with WebClient.conditionalget(
+            queryURL, webclient, conditional, validators
+        ) as resp:
+            if resp is None:
+                return []
+
+            rawdict = await resp.json()
+
+            with Metrics.getregistry().timer("wumbot_parse_seconds"):
+                if rawdict["appnews"] and rawdict["appnews"]["newsitems"]:
+                    return [
+                        SteamNewsPost(**item)
+                        for item in rawdict["appnews"]["newsitems"]
+                    ]
+                else:
+                    return []
 
     @staticmethod
     def getnewsforapp(
@@ -0,0 +1,70 @@
+import time
+import typing
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        """
+        In-memory cache with per-entry expiry & least recently used eviction
+
+        Entries expire ttl seconds after they are set (a per-entry ttl can also be given to set())
+        and once the cache holds maxsize entries, the least recently used entry is evicted to
+        make room for a new one
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._entries = OrderedDict()  # key: (expiry, value), least recently used first
+
+    def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        """
+        Return the cached value for key, or default if key is missing or has expired
+        """
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+
+        expiry, value = entry
+        if expiry <= time.monotonic():
+            del self._entries[key]
+            return default
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: typing.Hashable, value: typing.Any, ttl: float = None):
+        """
+        Cache value for key, expiring after ttl seconds (defaults to the cache's ttl)
+        """
+        ttl = ttl if ttl is not None else self.ttl
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        """
+        Remove key from the cache & return its value, or default if it isn't cached
+        """
+        entry = self._entries.pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+
+        return entry[1]
+
+    def clear(self):
+        """
+        Remove all entries from the cache
+        """
+        self._entries.clear()
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._entries)
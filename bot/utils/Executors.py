@@ -0,0 +1,118 @@
+import asyncio
+import functools
+import multiprocessing
+import typing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+_threadpool = None
+
+_cpupool = None
+_cpupoolkind = "process"
+_cpupoolworkers = 2
+
+
+def getthreadpool(max_workers: int = 4) -> ThreadPoolExecutor:
+    """
+    Return the bot-wide bounded thread pool for blocking I/O, creating it on first use
+    """
+    global _threadpool
+
+    if _threadpool is None:
+        _threadpool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="wumbot-io"
+        )
+
+    return _threadpool
+
+
+async def runblocking(func: typing.Callable, *args, **kwargs) -> typing.Any:
+    """
+    This function is a coroutine
+
+    Run a blocking callable in the bot-wide thread pool & return its result, so the event loop
+    is free to handle other events (e.g. the Discord gateway heartbeat) while it runs
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        getthreadpool(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def setcpupool(kind: str = "process", max_workers: int = 2):
+    """
+    Configure the bot-wide pool for CPU-bound work as a "process" or "thread" pool
+
+    Any existing pool is shut down, the new pool is created on first use
+    """
+    global _cpupool, _cpupoolkind, _cpupoolworkers
+
+    if kind not in ("process", "thread"):
+        raise ValueError(
+            f"Invalid CPU pool kind: '{kind}', must be 'process' or 'thread'"
+        )
+
+    if _cpupool is not None:
+        _cpupool.shutdown(wait=False)
+        _cpupool = None
+
+    _cpupoolkind = kind
+    _cpupoolworkers = max_workers
+
+
+def getcpupool() -> Executor:
+    """
+    Return the bot-wide pool for CPU-bound work, creating it on first use
+
+    Defaults to a process pool, so CPU-bound work doesn't hold the GIL the event loop needs.
+    Workers are started with forkserver where available, otherwise spawn
+    """
+    global _cpupool
+
+    if _cpupool is None:
+        if _cpupoolkind == "process":
+            # The pool is created after the bot's threads (e.g. the loop monitor & I/O pool)
+            # have started, forking then can copy locks held by those threads into the workers
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+            else:
+                context = multiprocessing.get_context("spawn")
+
+            _cpupool = ProcessPoolExecutor(
+                max_workers=_cpupoolworkers, mp_context=context
+            )
+        else:
+            _cpupool = ThreadPoolExecutor(
+                max_workers=_cpupoolworkers, thread_name_prefix="wumbot-cpu"
+            )
+
+    return _cpupool
+
+
+async def runcpubound(func: typing.Callable, *args, **kwargs) -> typing.Any:
+    """
+    This function is a coroutine
+
+    Run a CPU-bound callable in the bot-wide CPU pool & return its result, so the event loop
+    keeps running (e.g. heartbeating & responding to commands) while it runs
+
+    With a process pool, func must be a module-level function & its arguments and return
+    value must be picklable
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        getcpupool(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def shutdown():
+    """
+    Shut down the bot-wide pools without waiting for running work to finish
+    """
+    global _threadpool, _cpupool
+
+    for pool in (_threadpool, _cpupool):
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    _threadpool = None
+    _cpupool = None
@@ -0,0 +1,264 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import random
+import typing
+from collections import Counter
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+from yarl import URL
+
+# Headers describing the upstream connection or transfer, not the recorded body
+HOPHEADERS = {
+    "connection",
+    "content-encoding",
+    "content-length",
+    "keep-alive",
+    "transfer-encoding",
+}
+
+# Request headers that aren't forwarded upstream when recording, so full bodies are recorded
+SKIPREQUESTHEADERS = {"host", "accept-encoding", "if-none-match", "if-modified-since"}
+
+
+class Cassette:
+    def __init__(self, path: Path):
+        """
+        Directory of recorded HTTP responses, one JSON file per method & URL
+
+        Each entry holds the response status, headers & base64 encoded body. Entries are read
+        from disk once & then served from memory
+        """
+        self.path = Path(path)
+
+        self._entries = {}
+
+    def get(self, method: str, url: typing.Any) -> typing.Optional[typing.Tuple]:
+        """
+        Return the recorded (status, headers, body) for method & url, or None if there is no
+        recording
+        """
+        key = self._key(method, url)
+        if key not in self._entries:
+            entrypath = self.path / f"{key}.json"
+            if not entrypath.exists():
+                return None
+
+            with entrypath.open(mode="r") as fID:
+                entry = json.load(fID)
+
+            self._entries[key] = (
+                entry["status"],
+                [tuple(header) for header in entry["headers"]],
+                base64.b64decode(entry["body"]),
+            )
+
+        return self._entries[key]
+
+    def put(
+        self,
+        method: str,
+        url: typing.Any,
+        status: int,
+        headers: typing.Iterable[typing.Tuple[str, str]],
+        body: bytes,
+    ):
+        """
+        Record the response for method & url, replacing any existing recording
+        """
+        key = self._key(method, url)
+        headers = [tuple(header) for header in headers]
+        entry = {
+            "method": method.upper(),
+            "url": str(URL(url)),
+            "status": status,
+            "headers": headers,
+            "body": base64.b64encode(body).decode("ascii"),
+        }
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        with (self.path / f"{key}.json").open(mode="w") as fID:
+            json.dump(entry, fID, indent=2)
+
+        self._entries[key] = (status, headers, body)
+
+    @staticmethod
+    def _key(method: str, url: typing.Any) -> str:
+        return hashlib.sha1(f"{method.upper()} {URL(url)}".encode("utf-8")).hexdigest()
+
+
+class ReplayServer:
+    def __init__(
+        self,
+        cassette: Cassette,
+        record: bool = False,
+        latency: float = 0,
+        jitter: float = 0,
+        errorrate: float = 0,
+        errorstatus: int = 503,
+        seed: int = None,
+    ):
+        """
+        Local stand-in for the bot's upstream HTTP servers
+
+        A WebClient created with replay=<ReplayServer> sends every request here instead, with
+        the upstream URL encoded in the path. In replay mode responses are served from the
+        cassette; requests with no recording get a 404. In record mode requests are forwarded
+        upstream & their responses are saved to the cassette as they're served
+
+        Replayed responses honor If-None-Match against the recorded ETag, so conditional
+        requests & validator caching behave as they do against the real upstream
+
+        Every response is delayed by latency seconds plus up to jitter seconds, and errorrate
+        of the requests fail with errorstatus instead of being served. seed makes the jitter &
+        injected errors reproducible
+
+        Counts of served, recorded, not modified, missing & failed requests are kept in stats
+        """
+        self.cassette = cassette
+        self.record = record
+        self.latency = latency
+        self.jitter = jitter
+        self.errorrate = errorrate
+        self.errorstatus = errorstatus
+        self.stats = Counter()
+        self.baseURL = None
+
+        self._random = random.Random(seed)
+        self._runner = None
+        self._session = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        """
+        This function is a coroutine
+
+        Start serving on host & port, by default an unused local port
+        """
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        boundport = self._runner.addresses[0][1]
+        self.baseURL = URL.build(scheme="http", host=host, port=boundport)
+        if self.record:
+            self._session = aiohttp.ClientSession()
+
+        mode = "Recording" if self.record else "Replaying"
+        logging.info(
+            f"{mode} HTTP requests at {self.baseURL} using '{self.cassette.path}'"
+        )
+
+    async def close(self):
+        """
+        This function is a coroutine
+
+        Stop serving & close the upstream session used for recording
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def rewrite(self, url: typing.Any) -> URL:
+        """
+        Return the URL on this server that stands in for the upstream url
+        """
+        url = URL(url)
+        if url.is_default_port():
+            authority = url.raw_host
+        else:
+            authority = f"{url.raw_host}:{url.port}"
+
+        rewritten = f"{self.baseURL}/{url.scheme}/{authority}{url.raw_path}"
+        if url.raw_query_string:
+            rewritten = f"{rewritten}?{url.raw_query_string}"
+
+        return URL(rewritten, encoded=True)
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.stats["requests"] += 1
+
+        # Undo rewrite(): /<scheme>/<authority>/<path>?<query>
+        _, scheme, authority, path = f"{request.rel_url.raw_path}/".split("/", 3)
+        upstream = f"{scheme}://{authority}/{path[:-1]}"
+        if request.rel_url.raw_query_string:
+            upstream = f"{upstream}?{request.rel_url.raw_query_string}"
+        upstream = URL(upstream, encoded=True)
+
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self.errorrate and self._random.random() < self.errorrate:
+            self.stats["injectederrors"] += 1
+            return web.Response(status=self.errorstatus)
+
+        if self.record:
+            recorded = await self._recordupstream(request, upstream)
+        else:
+            recorded = self.cassette.get(request.method, upstream)
+
+        if recorded is None:
+            self.stats["missing"] += 1
+            logging.info(f"No recording for {request.method} '{upstream}'")
+            return web.Response(status=404)
+
+        status, headers, body = recorded
+        headers = [
+            (name, value) for name, value in headers if name.lower() not in HOPHEADERS
+        ]
+        etag = dict((name.lower(), value) for name, value in headers).get("etag")
+        if etag is not None and request.headers.get("If-None-Match") == etag:
+            self.stats["notmodified"] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+
+        # Keep redirects on this server, so following them is replayed too
+        for idx, (name, value) in enumerate(headers):
+            if name.lower() == "location":
+                headers[idx] = (name, str(self.rewrite(upstream.join(URL(value)))))
+
+        self.stats["served"] += 1
+        response = web.Response(status=status, body=body)
+        for name, value in headers:
+            response.headers.add(name, value)
+
+        return response
+
+    async def _recordupstream(
+        self, request: web.Request, upstream: URL
+    ) -> typing.Tuple[int, typing.List, bytes]:
+        headers = {
+            name: value
+            for name, value in request.headers.items()
+            if name.lower() not in SKIPREQUESTHEADERS
+        }
+        async with self._session.request(
+            request.method,
+            upstream,
+            headers=headers,
+            data=await request.read(),
+            allow_redirects=False,
+        ) as resp:
+            body = await resp.read()
+            recordedheaders = [
+                (name, value)
+                for name, value in resp.headers.items()
+                if name.lower() not in HOPHEADERS
+            ]
+
+        self.cassette.put(request.method, upstream, resp.status, recordedheaders, body)
+        self.stats["recorded"] += 1
+        logging.info(f"Recorded {request.method} '{upstream}': {resp.status}")
+
+        return resp.status, recordedheaders, body
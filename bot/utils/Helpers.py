@@ -1,3 +1,7 @@
+import os
+import typing
+from pathlib import Path
+
 import discord
 
 
@@ -23,3 +27,19 @@ def isWumbologist(member: discord.Member) -> bool:
     Check to see if a discord.Member has the 'Wumbologists' role
     """
     return "Wumbologists" in [str(role) for role in member.roles]
+
+
+def atomicwrite(path: Path, dump: typing.Callable[[typing.IO], typing.Any]):
+    """
+    Write path by calling dump with a temporary file open for writing, then flush it to disk &
+    swap it in for path
+
+    A crash mid-write can't leave a partial file behind. OSError is raised if the file can't
+    be written
+    """
+    tmppath = path.with_name(f"{path.name}.tmp")
+    with tmppath.open(mode="w") as fID:
+        dump(fID)
+        fID.flush()
+        os.fsync(fID.fileno())
+    os.replace(tmppath, path)
@@ -0,0 +1,223 @@
+import bisect
+import contextvars
+import time
+import typing
+from contextlib import contextmanager
+
+import aiohttp
+
+# Histogram bucket upper bounds, seconds
+DEFAULTBUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Metric name: (type, description), for the Prometheus exposition
+METRICS = {
+    "wumbot_fetch_seconds": (
+        "histogram",
+        "Time from request start to response headers",
+    ),
+    "wumbot_fetch_responses_total": ("counter", "HTTP responses by host & status"),
+    "wumbot_fetch_errors_total": (
+        "counter",
+        "HTTP requests that raised before a response",
+    ),
+    "wumbot_fetch_bytes_total": ("counter", "HTTP response body bytes read"),
+    "wumbot_conditional_hits_total": (
+        "counter",
+        "Conditional requests answered with 304",
+    ),
+    "wumbot_parse_seconds": ("histogram", "Time spent parsing fetched feeds"),
+    "wumbot_new_posts_total": ("counter", "New posts found by feed checks"),
+    "wumbot_post_send_seconds": ("histogram", "Time to send each new post or digest"),
+    "wumbot_digests_total": ("counter", "New post backlogs sent as a digest"),
+    "wumbot_check_seconds": ("histogram", "Feed check duration by outcome"),
+}
+
+# Name of the feed being checked in the current task, added to every metric recorded by it
+currentfeed = contextvars.ContextVar("currentfeed", default=None)
+
+
+class MetricsRegistry:
+    def __init__(self, buckets: typing.Iterable[float] = DEFAULTBUCKETS):
+        """
+        In-memory registry of counters & histograms, keyed by metric name & labels
+
+        If a feed is set in currentfeed, it's added to the metric's labels as "feed", so
+        fetchers & parsers don't need to know which feed they're working for
+
+        Histograms count observations into buckets, upper bounds in seconds, & keep their sum
+        """
+        self.buckets = tuple(sorted(buckets))
+
+        # (name, labels): value
+        self._counters = {}
+        # (name, labels): [bucket counts, sum, count]
+        self._histograms = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """
+        Increase the named counter by value
+        """
+        key = (name, self._labels(labels))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Record value in the named histogram
+        """
+        key = (name, self._labels(labels))
+        if key not in self._histograms:
+            self._histograms[key] = [[0] * (len(self.buckets) + 1), 0, 0]
+
+        histogram = self._histograms[key]
+        histogram[0][bisect.bisect_left(self.buckets, value)] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """
+        Context manager that records the duration of its block, in seconds, in the named
+        histogram
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> typing.Dict:
+        """
+        Return the current values of all metrics as a JSON serializable dictionary
+
+        Histogram bucket counts are cumulative & keyed by their upper bound, as in the
+        Prometheus exposition
+        """
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(self._counters.items())
+        ]
+
+        histograms = []
+        for (name, labels), (counts, total, count) in sorted(self._histograms.items()):
+            cumulative = 0
+            buckets = {}
+            for bound, bucketcount in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucketcount
+                buckets[str(bound)] = cumulative
+
+            histograms.append(
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "buckets": buckets,
+                    "sum": total,
+                    "count": count,
+                }
+            )
+
+        return {"counters": counters, "histograms": histograms}
+
+    def prometheus(self) -> str:
+        """
+        Return all metrics in the Prometheus text exposition format
+        """
+        snapshot = self.snapshot()
+        samples = {}
+        for counter in snapshot["counters"]:
+            samples.setdefault(counter["name"], []).append(
+                f"{counter['name']}{self._format(counter['labels'])} {counter['value']}"
+            )
+
+        for histogram in snapshot["histograms"]:
+            name, labels = histogram["name"], histogram["labels"]
+            lines = samples.setdefault(name, [])
+            for bound, count in histogram["buckets"].items():
+                bucketlabels = {**labels, "le": bound}
+                lines.append(f"{name}_bucket{self._format(bucketlabels)} {count}")
+            lines.append(f"{name}_sum{self._format(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{self._format(labels)} {histogram['count']}")
+
+        exposition = []
+        for name, lines in samples.items():
+            metrictype, description = METRICS.get(name, ("untyped", ""))
+            exposition.append(f"# HELP {name} {description}")
+            exposition.append(f"# TYPE {name} {metrictype}")
+            exposition.extend(lines)
+
+        return "\n".join(exposition) + "\n"
+
+    def reset(self):
+        """
+        Drop all recorded metrics
+        """
+        self._counters.clear()
+        self._histograms.clear()
+
+    @staticmethod
+    def _labels(labels: typing.Dict) -> typing.Tuple:
+        feed = currentfeed.get()
+        if feed is not None:
+            labels.setdefault("feed", feed)
+
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    @staticmethod
+    def _format(labels: typing.Dict) -> str:
+        if not labels:
+            return ""
+
+        escaped = (
+            (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for key, value in labels.items()
+        )
+        return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+_registry = MetricsRegistry()
+
+
+def getregistry() -> MetricsRegistry:
+    """
+    Return the process-wide MetricsRegistry
+    """
+    return _registry
+
+
+def traceconfig() -> aiohttp.TraceConfig:
+    """
+    Return an aiohttp TraceConfig that records fetch latency, status, errors, conditional hits
+    & bytes read with response.read() (including text() & json()) in the process-wide registry
+
+    Bytes read incrementally from response.content aren't traced by aiohttp
+    """
+
+    async def _onrequeststart(session, ctx, params):
+        ctx.start = time.perf_counter()
+        ctx.host = params.url.host
+
+    async def _onrequestend(session, ctx, params):
+        status = params.response.status
+        _registry.observe(
+            "wumbot_fetch_seconds", time.perf_counter() - ctx.start, host=ctx.host
+        )
+        _registry.inc("wumbot_fetch_responses_total", host=ctx.host, status=status)
+        if status == 304:
+            _registry.inc("wumbot_conditional_hits_total", host=ctx.host)
+
+    async def _onrequestexception(session, ctx, params):
+        _registry.inc(
+            "wumbot_fetch_errors_total",
+            host=ctx.host,
+            error=type(params.exception).__name__,
+        )
+
+    async def _onresponsechunk(session, ctx, params):
+        _registry.inc("wumbot_fetch_bytes_total", len(params.chunk), host=ctx.host)
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(_onrequeststart)
+    trace.on_request_end.append(_onrequestend)
+    trace.on_request_exception.append(_onrequestexception)
+    trace.on_response_chunk_received.append(_onresponsechunk)
+
+    return trace
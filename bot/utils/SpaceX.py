@@ -1,14 +1,18 @@
 import logging
 import typing
 
-import aiohttp
 import requests
 
+from bot.utils import WebClient
+
 
 class SpaceXAPI:
     @staticmethod
     async def async_get(
-        endpoint: str = "", method: str = "", query: typing.Dict = {}
+        endpoint: str = "",
+        method: str = "",
+        query: typing.Dict = {},
+        webclient: WebClient.WebClient = None,
     ) -> typing.Tuple:
         """Asynchronous GET request to the SpaceX API
         Parameters
@@ -19,6 +23,8 @@ class SpaceXAPI:
                 The method used for the request
             query : dict
                 A dictionary representation of query string options
+            webclient : WebClient
+                HTTP client used for the request, defaults to a temporary client
         Returns
         -------
             tuple
@@ -27,12 +33,11 @@ class SpaceXAPI:
         requestURL = SpaceXAPI._buildURL(endpoint, method)
 
         logging.info(f"Making query to: {requestURL}")
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                requestURL, params=query, raise_for_status=True
-            ) as resp:
-                logging.info("Successful response received")
-                return await resp.json(), resp.headers
+        async with WebClient.conditionalget(
+            requestURL, webclient, params=query
+        ) as resp:
+            logging.info("Successful response received")
+            return await resp.json(), resp.headers
 
     @staticmethod
     def get(
@@ -0,0 +1,141 @@
+import functools
+import json
+import logging
+import typing
+from pathlib import Path
+
+from bot.utils import Helpers
+
+
+class ValidatorCache:
+    def __init__(self, cachepath: Path = Path("./log/httpvalidators.JSON")):
+        """
+        Persistent cache of HTTP validators (ETag & Last-Modified) keyed by request URL
+
+        Fetchers use the cached validators to issue conditional GET requests; a 304 response
+        means the resource is unchanged since it was last successfully fetched & parsed
+
+        The cache is loaded from cachepath on first use and rewritten whenever it changes
+        """
+        self.cachepath = cachepath
+        self._validators = None
+
+    def headers(self, url: typing.Any) -> typing.Dict:
+        """
+        Return conditional request headers for url, empty if no validators are cached
+        """
+        cached = self._load().get(str(url), {})
+
+        headers = {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("lastmodified"):
+            headers["If-Modified-Since"] = cached["lastmodified"]
+
+        return headers
+
+    def update(self, url: typing.Any, responseheaders: typing.Mapping):
+        """
+        Store the ETag & Last-Modified validators from responseheaders for url
+
+        If the response carries neither validator, any cached entry for url is dropped
+        """
+        validators = self._load()
+
+        entry = {
+            "etag": responseheaders.get("ETag"),
+            "lastmodified": responseheaders.get("Last-Modified"),
+        }
+        if not any(entry.values()):
+            if validators.pop(str(url), None) is not None:
+                self._save()
+            return
+
+        if validators.get(str(url)) != entry:
+            validators[str(url)] = entry
+            self._save()
+
+    def forget(self, url: typing.Any):
+        """
+        Drop any cached validators for url, forcing the next request to be unconditional
+        """
+        if self._load().pop(str(url), None) is not None:
+            self._save()
+
+    def _load(self) -> typing.Dict:
+        if self._validators is None:
+            self._validators = {}
+            if self.cachepath.exists():
+                try:
+                    with self.cachepath.open(mode="r") as fID:
+                        self._validators = json.load(fID)
+                except (OSError, ValueError):
+                    logging.info(
+                        f"Could not load HTTP validators from '{self.cachepath}'"
+                    )
+
+        return self._validators
+
+    def _save(self):
+        try:
+            Helpers.atomicwrite(
+                self.cachepath, functools.partial(json.dump, self._validators)
+            )
+        except OSError:
+            logging.info(f"Could not save HTTP validators to '{self.cachepath}'")
+
+
+class StagedValidators:
+    def __init__(self, cache: ValidatorCache, scope: str):
+        """
+        View of a ValidatorCache for one consumer (e.g. a NewsParser) that holds updates until
+        they're committed
+
+        Entries are stored in cache under the scope, so consumers fetching the same URL each
+        track the responses they've processed. update() only stages a response's validators;
+        commit() stores them once the consumer has finished with the response (e.g. posted
+        everything in it), & discard() drops them if it failed, so the next request isn't
+        answered with a 304 for a response that was never processed
+
+        Supports the same headers() & update() calls as ValidatorCache, so it can be given to
+        fetchers in its place
+        """
+        self.cache = cache
+        self.scope = scope
+
+        self._staged = {}
+
+    def headers(self, url: typing.Any) -> typing.Dict:
+        """
+        Return conditional request headers for url, from committed validators only
+
+        Any validators staged for url by an earlier request are dropped
+        """
+        self._staged.pop(str(url), None)
+        return self.cache.headers(self._key(url))
+
+    def update(self, url: typing.Any, responseheaders: typing.Mapping):
+        """
+        Stage the validators from responseheaders for url until commit()
+        """
+        self._staged[str(url)] = {
+            "ETag": responseheaders.get("ETag"),
+            "Last-Modified": responseheaders.get("Last-Modified"),
+        }
+
+    def commit(self):
+        """
+        Store all staged validators in the cache
+        """
+        for url, responseheaders in self._staged.items():
+            self.cache.update(self._key(url), responseheaders)
+        self._staged.clear()
+
+    def discard(self):
+        """
+        Drop all staged validators, leaving the cache as it was
+        """
+        self._staged.clear()
+
+    def _key(self, url: typing.Any) -> str:
+        return f"{self.scope} {url}"
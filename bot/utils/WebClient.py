@@ -0,0 +1,161 @@
+import logging
+import typing
+from contextlib import asynccontextmanager
+
+import aiohttp
+
+from bot.utils import Metrics
+from bot.utils.HTTPReplay import ReplayServer
+from bot.utils.ValidatorCache import ValidatorCache
+
+
+class WebClient:
+    def __init__(
+        self,
+        limit: int = 32,
+        limit_per_host: int = 4,
+        keepalive_timeout: float = 60,
+        ttl_dns_cache: int = 600,
+        timeout: float = 30,
+        validators: ValidatorCache = None,
+        replay: ReplayServer = None,
+    ):
+        """
+        Bot-wide HTTP client backed by a single pooled aiohttp.ClientSession
+
+        The session is created lazily on first use so it is always bound to the running event
+        loop, and is reused for every request until close() is called. Connections are pooled
+        (limit total, limit_per_host per host), kept alive for keepalive_timeout seconds, and
+        DNS lookups are cached for ttl_dns_cache seconds. Fetch latency, status & bytes of every
+        request are recorded in the bot-wide Metrics registry
+
+        ETag & Last-Modified validators for conditional requests are held by validators, which
+        defaults to a ValidatorCache persisted in ./log
+
+        If replay is provided, every request is sent to that local ReplayServer instead of its
+        upstream, to record or replay the bot's HTTP traffic
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.timeout = timeout
+        self.validators = validators if validators is not None else ValidatorCache()
+        self.replay = replay
+
+        self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        Return the pooled session, creating it if it does not exist or has been closed
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.ttl_dns_cache,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=[Metrics.traceconfig()],
+            )
+            logging.info("Pooled HTTP session opened")
+
+        return self._session
+
+    def get(self, url: typing.Any, **kwargs) -> typing.Any:
+        """
+        Issue a GET request using the pooled session
+
+        Returns aiohttp's request context manager, use as: async with client.get(url) as resp:
+        """
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: typing.Any, **kwargs) -> typing.Any:
+        """
+        Issue a HEAD request using the pooled session
+
+        Returns aiohttp's request context manager, use as: async with client.head(url) as resp:
+        """
+        return self.request("HEAD", url, **kwargs)
+
+    def request(self, method: str, url: typing.Any, **kwargs) -> typing.Any:
+        """
+        Issue a request using the pooled session, via the replay server if one is set
+
+        Returns aiohttp's request context manager
+        """
+        if self.replay is not None:
+            url = self.replay.rewrite(url)
+
+        return self.session.request(method, url, **kwargs)
+
+    async def close(self):
+        """
+        This function is a coroutine
+
+        Close the pooled session and release its connections
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logging.info("Pooled HTTP session closed")
+
+        self._session = None
+
+
+@asynccontextmanager
+async def conditionalget(
+    url: typing.Any,
+    webclient: WebClient = None,
+    conditional: bool = False,
+    validators: ValidatorCache = None,
+    **kwargs,
+) -> typing.AsyncIterator[typing.Optional[aiohttp.ClientResponse]]:
+    """
+    Async context manager issuing a GET request for url, yielding the response or None if the
+    resource is unchanged since it was last fetched (304)
+
+    The request is made using webclient, e.g. the bot's WumbotClient.webclient, or a temporary
+    WebClient closed on exit if not provided. Error statuses are raised as
+    aiohttp.ClientResponseError
+
+    If conditional is True, the request is made with the validators cached for url, & the
+    response's validators are stored once the block exits without an error, so a response that
+    fails to be processed is fetched in full next time. validators, e.g. a parser's
+    StagedValidators, are used in place of the client's cache if provided
+
+    Additional keyword arguments are passed to WebClient.get, use as:
+        async with conditionalget(url, webclient, conditional=True) as resp:
+    """
+    if webclient is None:
+        webclient = WebClient()
+        try:
+            async with conditionalget(
+                url, webclient, conditional, validators, **kwargs
+            ) as resp:
+                yield resp
+        finally:
+            await webclient.close()
+        return
+
+    validators = validators if validators is not None else webclient.validators
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if conditional:
+        headers.update(validators.headers(url))
+
+    async with webclient.get(url, headers=headers, **kwargs) as resp:
+        if resp.status == 304:
+            logging.info(f"Unchanged since last fetch: '{url}'")
+            yield None
+            return
+
+        resp.raise_for_status()
+        yield resp
+
+    if conditional:
+        validators.update(url, resp.headers)